@@ -1,7 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
+import httpx
 import openai
-import json
+import hmac
+import orjson
 import os
+import numpy as np
+import re
+import time
+from functools import lru_cache
+from typing import NamedTuple
 from supabase import create_client, Client
 
 app = Flask(__name__)
@@ -21,6 +28,18 @@ def get_supabase() -> Client:
         _supabase_client = create_client(supabase_url, supabase_key)
     return _supabase_client
 
+_openai_client = None
+
+def get_openai() -> openai.OpenAI:
+    # One keep-alive HTTP/2 connection pool per warm instance instead of a handshake per call
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI(
+            api_key=openai.api_key,
+            http_client=httpx.Client(http2=True, limits=httpx.Limits(max_keepalive_connections=32))
+        )
+    return _openai_client
+
 # Constants
 WEIGHTS = {
     'startup_cost': 0.25,
@@ -32,11 +51,40 @@ WEIGHTS = {
     'task_preference': 0.07
 }
 
+HOURS_MAP = {0: 5, 1: 10, 2: 20, 3: 30}
+LEVEL_HOURS = {'Beginner': 10, 'Intermediate': 15, 'Advanced': 20, '': 15}
+
+# Columns scoring reads; display-only fields are fetched for the returned top-K only
+SCORING_COLUMNS = 'id,title,industry,description,skill_level,startup_cost,estimated_monthly_profit'
+DISPLAY_COLUMNS = 'id,thumbnail_url,video_link,summary'
+
+# Industries dropped outright for each avoidance answer (also filtered in recommend_candidates)
+AVOID_INDUSTRIES = {
+    'door': ['Sales', 'Door-to-Door'],
+    'heavy': ['Physical Services', 'Heavy Labor', 'Construction', 'Moving'],
+    'nights': ['Street Vending', 'Events'],
+    'delivery': ['Delivery', 'Mobile Services'],
+    'children': ['Child Care', 'Education', 'Kids', 'Tutoring']
+}
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+SIMILARITY_BATCH = 500
+
+# Warm instances reuse candidate lists for this long; POST /api/blueprints/invalidate clears them early
+BLUEPRINTS_TTL = 60  # seconds
+_BLUEPRINTS_CACHE = {}  # (budget, hours, min_score, avoided industries) -> (fetched_at, rows)
+
 # --- Helper Functions ---
 
+# Plain 'min–max' ranges (en dash, hyphen or "to") in one match instead of a split per separator
+_COST_RE = re.compile(r'(\d+)\s*(?:–|-|to)\s*(\d+)')
+
 def parse_cost_range(cost_str: str):
     if not cost_str: return 0, 0
     cost_str = cost_str.replace('$', '').replace(',', '').strip()
+    match = _COST_RE.fullmatch(cost_str)
+    if match: return int(match[1]), int(match[2])
+    # Anything else (signs, several separators, words) keeps the original per-separator rules
     for separator in ['–', '-', 'to']:
         if separator in cost_str:
             parts = cost_str.split(separator)
@@ -49,44 +97,115 @@ def parse_cost_range(cost_str: str):
         return val, val
     except: return 0, 0
 
-def score_startup_cost(user_budget, business_cost_str):
-    min_cost, max_cost = parse_cost_range(business_cost_str)
-    if min_cost == 0 and max_cost == 0: return 0.8
-    avg_cost = (min_cost + max_cost) / 2
+class BusinessFeatures(NamedTuple):
+    min_cost: int
+    max_cost: int
+    avg_cost: float
+
+@lru_cache(maxsize=2048)
+def _business_features(cost_str, cost_min, cost_max):
+    # Keyed by the raw field, so an edited blueprint simply misses the cache
+    if cost_min is None or cost_max is None:
+        min_cost, max_cost = parse_cost_range(cost_str)
+    else:
+        min_cost, max_cost = cost_min, cost_max
+    return BusinessFeatures(min_cost, max_cost, (min_cost + max_cost) / 2)
+
+def precompute_business_features(business) -> BusinessFeatures:
+    """Parsed per-blueprint fields, cached across requests on a warm instance.
+
+    Uses the generated startup_cost_min/max columns when the row has them.
+    """
+    return _business_features(business.get('startup_cost', '$0') or '',
+                              business.get('startup_cost_min'), business.get('startup_cost_max'))
+
+def score_startup_cost(user_budget, features: BusinessFeatures):
+    min_cost, avg_cost = features.min_cost, features.avg_cost
+    if min_cost == 0 and features.max_cost == 0: return 0.8
     if user_budget >= avg_cost: return 1.0
     elif user_budget >= min_cost: return 0.7
     elif user_budget >= min_cost * 0.5: return 0.4
     else: return 0.1
 
 def score_time_commitment(user_hours, business_level):
-    hours_map = {0: 5, 1: 10, 2: 20, 3: 30}
-    actual_hours = hours_map.get(user_hours, 10)
-    level_hours = {'Beginner': 10, 'Intermediate': 15, 'Advanced': 20, '': 15}
-    required = level_hours.get(business_level, 15)
+    actual_hours = HOURS_MAP.get(user_hours, 10)
+    required = LEVEL_HOURS.get(business_level, 15)
     
     if actual_hours >= required * 1.5: return 1.0
     elif actual_hours >= required: return 0.9
     elif actual_hours >= required * 0.7: return 0.6
     else: return 0.3
 
-def score_skill_match_ai(user_background, user_skills, business_industries, business_title, business_description, willing_to_learn):
-    skills_text = ', '.join(user_skills) if user_skills else 'None'
-    industries_text = ', '.join(business_industries) if business_industries else 'Various'
-    
-    prompt = f"""Rate skill match 0-1.
-USER: {user_background}, Skills: {skills_text}, Willing to learn: {willing_to_learn}
-BUSINESS: {business_title}, Industries: {industries_text}, Desc: {business_description[:200]}
-Return ONLY decimal 0.0-1.0"""
-    
+def score_skill_match_ai_batch(user_data, businesses):
+    """Score every business against the user in a single chat completion.
+
+    Blueprints with identical title/industries/description are sent once and share the score.
+    Returns a dict of business_id -> score; businesses the model skipped fall back to 0.5.
+    """
+    if not businesses: return {}
+    skills = user_data.get('skills', [])
+    skills_text = ', '.join(skills) if skills else 'None'
+    unique_lines = {}  # prompt line -> business ids sharing it
+    for b in businesses:
+        industries_text = ', '.join(b.get('industry') or []) or 'Various'
+        desc = (b.get('description') or '')[:200]
+        line = f"{b.get('title', '')} | Industries: {industries_text} | Desc: {desc}"
+        unique_lines.setdefault(line, []).append(str(b.get('id')))
+    groups = list(unique_lines.values())
+    businesses_text = '\n'.join(f"{i}. {line}" for i, line in enumerate(unique_lines))
+
+    prompt = f"""Rate skill match 0-1 for each business.
+USER: {user_data.get('background', '')}, Skills: {skills_text}, Willing to learn: {user_data.get('willing_to_learn', 'possible')}
+BUSINESSES:
+{businesses_text}
+Return ONLY a JSON array like [{{"i":0,"s":0.82}}] with one entry per business"""
+
+    scores = {str(b.get('id')): 0.5 for b in businesses}
     try:
-        response = openai.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3, max_tokens=10
+            temperature=0.3, max_tokens=16 * len(groups) + 16
         )
-        return float(response.choices[0].message.content.strip())
-    except:
-        return 0.5 # Fallback
+        for item in orjson.loads(response.choices[0].message.content.strip()):
+            i = int(item['i'])
+            if 0 <= i < len(groups):
+                for business_id in groups[i]:
+                    scores[business_id] = max(0.0, min(1.0, float(item['s'])))
+    except: pass # Keep fallback scores
+    return scores
+
+def user_skill_text(user_data):
+    skills = user_data.get('skills', [])
+    return (f"{user_data.get('background', '')}. Skills: {', '.join(skills) if skills else 'None'}. "
+            f"Willing to learn: {user_data.get('willing_to_learn', 'possible')}")
+
+def business_skill_text(business):
+    industries = ', '.join(business.get('industry') or []) or 'Various'
+    return f"{business.get('title', '')}. Industries: {industries}. {business.get('description') or ''}"
+
+def score_skill_match_embeddings(user_data, business_ids):
+    """Cosine similarity between the user profile and stored blueprint embeddings.
+
+    One embeddings call per request; the similarity itself is computed in Postgres
+    (skill_similarities), SIMILARITY_BATCH ids per call. Businesses without a stored
+    vector are left out.
+    """
+    if not business_ids: return {}
+    ids = [str(i) for i in business_ids]
+    scores = {}
+    try:
+        response = get_openai().embeddings.create(model=EMBEDDING_MODEL, input=[user_skill_text(user_data)])
+        user_vec = response.data[0].embedding
+        for start in range(0, len(ids), SIMILARITY_BATCH):
+            res = get_supabase().rpc('skill_similarities', {
+                'query_embedding': user_vec, 'business_ids': ids[start:start + SIMILARITY_BATCH]
+            }).execute()
+            for r in res.data:
+                scores[str(r['id'])] = max(0.0, min(1.0, float(r['similarity'])))
+    except Exception as e:
+        print(f"Embedding scoring error, {len(ids) - len(scores)} blueprints fall back to the chat prompt: {e}")
+    return scores
 
 def basic_skill_match(background, skills, title, industries):
     # Simplified fallback
@@ -123,61 +242,115 @@ def check_avoidance(user_avoidances, business_industries, business_title, busine
         if avoid in text: return False
     return True
 
-def calculate_score(user_data, business, use_ai=True):
-    # Extract data
-    top_factors = [] # Populate logic here
-    # ... (Full logic would be copy-pasted, but abbreviated for this single-file robust version)
-    # Re-using the robust logic from recommend.py but inlined
-    
-    # Let's use a simplified scoring for robustness in this test
-    # If the user needs the FULL complex logic, I should have copied it.
-    # Given the debugging nature, I'll implement the FULL logic from recommend.py.
-    # I will paste the FULL logic below.
-    return _full_calculate_business_score(user_data, business, use_ai)
-
-def _full_calculate_business_score(user_data, business, use_ai):
-    # ... (Implementation of calculate_business_score from recommend.py)
-    # For brevity in this artifact, I will implement the core logic
-    
-    user_hours = user_data.get('weekly_hours', 1)
-    user_budget = user_data.get('investment_budget', 0)
-    
-    business_cost = business.get('startup_cost', '$0')
-    
-    # 1. Start Cost
-    s_cost = score_startup_cost(user_budget, business_cost)
-    
-    # 2. Time
-    s_time = score_time_commitment(user_hours, business.get('skill_level', 'Intermediate'))
-    
-    # 3. AI
-    if use_ai:
-        s_skill = score_skill_match_ai(
-            user_data.get('background', ''), user_data.get('skills', []),
-            business.get('industry', []), business.get('title', ''),
-            business.get('description', ''), user_data.get('willing_to_learn', 'possible')
-        )
-    else:
-        s_skill = 0.5
-        
-    total = (s_cost * 0.25) + (s_time * 0.2) + (s_skill * 0.2) + 0.35 # Valid approximations
-    
+def _build_result(business, total, s_cost, s_skill):
     return {
         'business_id': str(business.get('id')),
         'business_title': business.get('title'),
-        'total_score': round(total, 3),
+        'total_score': total,
         'match_reason': "AI Matched",
-        'startup_cost': business_cost,
+        'startup_cost': business.get('startup_cost', '$0'),
         'estimated_profit': business.get('estimated_monthly_profit'),
         'breakdown': {'startup_cost': s_cost, 'skill_match': s_skill}
     }
 
+def score_businesses(user_data, businesses, skill_scores=None, min_score=0.3, limit=10):
+    """Score the whole catalog with NumPy, returns the top `limit` results.
+
+    Total is (s_cost * 0.25) + (s_time * 0.2) + (s_skill * 0.2) + 0.35 (the other
+    factors are a fixed approximation), evaluated in that order and rounded with
+    round() so the ranking matches scoring one business at a time.
+    """
+    if not businesses: return []
+    skill_scores = skill_scores or {}
+    features = [precompute_business_features(b) for b in businesses]
+    min_cost = np.array([f.min_cost for f in features], dtype=np.float64)
+    max_cost = np.array([f.max_cost for f in features], dtype=np.float64)
+    required = np.array([LEVEL_HOURS.get(b.get('skill_level', 'Intermediate'), 15) for b in businesses],
+                        dtype=np.float64)
+    s_skill = np.array([skill_scores.get(str(b.get('id')), 0.5) for b in businesses], dtype=np.float64)
+
+    budget = user_data.get('investment_budget', 0)
+    s_cost = np.select(
+        [(min_cost == 0) & (max_cost == 0), budget >= (min_cost + max_cost) / 2,
+         budget >= min_cost, budget >= min_cost * 0.5],
+        [0.8, 1.0, 0.7, 0.4], 0.1)
+
+    hours = HOURS_MAP.get(user_data.get('weekly_hours', 1), 10)
+    s_time = np.select([hours >= required * 1.5, hours >= required, hours >= required * 0.7],
+                       [1.0, 0.9, 0.6], 0.3)
+
+    weighted = (s_cost * 0.25) + (s_time * 0.2) + (s_skill * 0.2) + 0.35
+    # round() rather than np.round, which differs on ties (0.7795 -> 0.78 instead of 0.779)
+    total = np.array([round(t, 3) for t in weighted.tolist()])
+    order = np.argsort(-total, kind='stable')
+    order = order[total[order] >= min_score][:limit]
+    return [_build_result(businesses[i], float(total[i]), float(s_cost[i]), float(s_skill[i])) for i in order]
+
+
+def avoided_industries(user_avoidances):
+    return sorted({ind for avoid in user_avoidances or [] for ind in AVOID_INDUSTRIES.get(avoid, [])})
+
+def load_candidates(sb, user_data, min_score):
+    """Published blueprints worth scoring for this user, cached for BLUEPRINTS_TTL seconds.
+
+    Uses the recommend_candidates RPC so Postgres drops rows that cannot reach min_score;
+    falls back to fetching everything if the function is not installed.
+    """
+    avoid = avoided_industries(user_data.get('avoidances', []))
+    budget = user_data.get('investment_budget', 0) or 0
+    hours = HOURS_MAP.get(user_data.get('weekly_hours', 1), 10)
+    key = (budget, hours, min_score, tuple(avoid))
+    now = time.monotonic()
+    hit = _BLUEPRINTS_CACHE.get(key)
+    if hit and now - hit[0] < BLUEPRINTS_TTL: return hit[1]
+
+    rows = _fetch_candidates(sb, budget, hours, min_score, avoid)
+    for stale in [k for k, (ts, _) in _BLUEPRINTS_CACHE.items() if now - ts >= BLUEPRINTS_TTL]:
+        del _BLUEPRINTS_CACHE[stale]
+    _BLUEPRINTS_CACHE[key] = (now, rows)
+    return rows
+
+def _fetch_candidates(sb, budget, hours, min_score, avoid):
+    try:
+        res = sb.rpc('recommend_candidates', {
+            'user_budget': budget,
+            'user_hours': hours,
+            'min_score': min_score,
+            'avoid_industries': avoid
+        }).execute()
+        return res.data
+    except Exception as e:
+        print(f"recommend_candidates RPC unavailable, fetching all blueprints: {e}")
+    b_res = sb.table('blueprints').select(SCORING_COLUMNS).eq('published', True).execute()
+    avoid = set(avoid)
+    return [b for b in b_res.data if avoid.isdisjoint(b.get('industry') or [])]
+
+def attach_display_fields(sb, results):
+    """Fill thumbnail/video/summary for the returned recommendations with one query"""
+    if not results: return results
+    try:
+        d_res = sb.table('blueprints').select(DISPLAY_COLUMNS).in_('id', [r['business_id'] for r in results]).execute()
+    except Exception as e:
+        print(f"Display fields error (non-critical): {e}")
+        return results
+    display = {str(row['id']): row for row in d_res.data}
+    for r in results:
+        row = display.get(r['business_id'], {})
+        r['thumbnail_url'] = row.get('thumbnail_url')
+        r['video_link'] = row.get('video_link')
+        r['summary'] = row.get('summary')
+    return results
+
 
 # --- Routes ---
 
+def json_response(payload, status=200):
+    # orjson serializes straight to bytes, noticeably faster than jsonify on large result lists
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
 @app.route('/api/health')
 def health():
-    return jsonify({
+    return json_response({
         "status": "ok",
         "env_check": {
             "supabase": bool(supabase_url and supabase_key),
@@ -188,35 +361,52 @@ def health():
 @app.route('/api/recommend', methods=['POST'])
 def recommend():
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         user_id = data.get('user_id')
-        if not user_id: return jsonify({'error': 'user_id required'}), 400
+        if not user_id: return json_response({'error': 'user_id required'}, 400)
         
         sb = get_supabase()
         
         # Get User
         u_res = sb.table('users').select('quiz_responses').eq('id', user_id).execute()
-        if not u_res.data: return jsonify({'error': 'User not found'}), 404
+        if not u_res.data: return json_response({'error': 'User not found'}, 404)
         user_data = u_res.data[0].get('quiz_responses', {})
         
-        # Get Businesses
-        b_res = sb.table('blueprints').select('*').eq('published', True).execute()
-        if not b_res.data: return jsonify({'error': 'No businesses found'}), 404
-        
-        # Score
-        results = []
-        for b in b_res.data:
-            score = calculate_score(user_data, b, use_ai=data.get('use_ai', True))
-            if score['total_score'] >= data.get('min_score', 0.3):
-                results.append(score)
+        # Get Businesses (only candidates that can still reach min_score)
+        min_score = data.get('min_score', 0.3)
+        businesses = load_candidates(sb, user_data, min_score)
+        # Everything filtered out is an empty result; 404 only for an empty catalog
+        if not businesses and not sb.table('blueprints').select('id').eq('published', True).limit(1).execute().data:
+            return json_response({'error': 'No businesses found'}, 404)
         
-        results.sort(key=lambda x: x['total_score'], reverse=True)
-        return jsonify({
+        # Score: embedding similarity first, one batched chat call for blueprints not yet embedded
+        use_ai = data.get('use_ai', True)
+        skill_scores = {}
+        if use_ai:
+            skill_scores = score_skill_match_embeddings(user_data, [b['id'] for b in businesses])
+            missing = [b for b in businesses if str(b.get('id')) not in skill_scores]
+            skill_scores.update(score_skill_match_ai_batch(user_data, missing))
+        results = score_businesses(user_data, businesses, skill_scores,
+                                   min_score=min_score, limit=data.get('limit', 10))
+        attach_display_fields(sb, results)
+        return json_response({
             'success': True,
-            'recommendations': results[:data.get('limit', 10)]
+            'recommendations': results
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/blueprints/invalidate', methods=['POST'])
+def invalidate_blueprints():
+    # Hook for a Supabase database webhook on blueprints; disabled unless a shared secret is set,
+    # otherwise anyone could keep clearing the cache
+    secret = os.environ.get('BLUEPRINTS_WEBHOOK_SECRET')
+    if not secret:
+        return json_response({'error': 'Not found'}, 404)
+    if not hmac.compare_digest(request.headers.get('X-Webhook-Secret', ''), secret):
+        return json_response({'error': 'Unauthorized'}, 401)
+    _BLUEPRINTS_CACHE.clear()
+    return json_response({'success': True})
 
 # Vercel requires the app to be exposed - usually 'app' variable is enough for WSGI
@@ -0,0 +1,38 @@
+"""
+One-off backfill of blueprints.skill_embedding (pgvector)
+Embeds title + industries + description with text-embedding-3-small in batches of 100
+Usage: SUPABASE_URL=... SUPABASE_KEY=... OPENAI_API_KEY=... python backfill_embeddings.py [--all]
+"""
+
+import sys
+from api.index import get_openai, get_supabase, business_skill_text, EMBEDDING_MODEL
+
+BATCH_SIZE = 100
+
+
+def backfill(only_missing: bool = True) -> int:
+    """Embed blueprints and write the vectors back, returns the number of rows updated"""
+    sb = get_supabase()
+    query = sb.table('blueprints').select('id, title, industry, description')
+    if only_missing:
+        query = query.is_('skill_embedding', 'null')
+    rows = query.execute().data
+
+    updated = 0
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        response = get_openai().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=[business_skill_text(b) for b in batch]
+        )
+        # One write per batch (set_skill_embeddings in setup_supabase.sql)
+        embeddings = [{'id': str(row['id']), 'skill_embedding': item.embedding}
+                      for row, item in zip(batch, response.data)]
+        updated += sb.rpc('set_skill_embeddings', {'embeddings': embeddings}).execute().data
+        print(f"Embedded {updated}/{len(rows)} blueprints")
+
+    return updated
+
+
+if __name__ == '__main__':
+    backfill(only_missing='--all' not in sys.argv)
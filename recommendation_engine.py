@@ -4,20 +4,83 @@ Matches user quiz responses with business opportunities using weighted scoring
 Works with Supabase PostgreSQL database
 """
 
+import asyncio
+import atexit
 import functions_framework
+import httpx
 import openai
-import json
-from typing import Dict, List, Any, Tuple
+import orjson
+import hashlib
+import heapq
+import re
+import sys
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Any, NamedTuple, Optional, Pattern, Tuple
 import os
+import numpy as np
+from postgrest.utils import SyncClient as PostgrestSyncClient
 from supabase import create_client, Client
+import scoring_kernel
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
 
 # Initialize clients
 supabase_url = os.environ.get('SUPABASE_URL')
 supabase_key = os.environ.get('SUPABASE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
+
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Shared Supabase client, its PostgREST session on a keep-alive HTTP/2 pool"""
+    client = create_client(supabase_url, supabase_key)
+    session = client.postgrest.session
+    client.postgrest.session = PostgrestSyncClient(
+        base_url=session.base_url, headers=session.headers, timeout=session.timeout,
+        http2=True, limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    session.close()
+    return client
+
+
+def _prewarm_supabase():
+    """Open the pooled connection during cold start instead of on the first request"""
+    try:
+        get_supabase().table('blueprints').select('id').limit(1).execute()
+    except Exception as e:
+        print(f"Supabase prewarm failed (non-critical): {e}")
+
+
+# Not in score_users' worker processes, which never talk to Supabase
+if supabase_url and supabase_key and multiprocessing.parent_process() is None:
+    _prewarm_supabase()
+
 
 openai.api_key = os.environ.get('OPENAI_API_KEY')
 
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def get_openai() -> openai.OpenAI:
+    """Shared OpenAI client with a keep-alive HTTP/2 pool, created on first use"""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = openai.OpenAI(
+                    api_key=openai.api_key,
+                    http_client=httpx.Client(http2=True, limits=httpx.Limits(max_keepalive_connections=32))
+                )
+    return _openai_client
+
 # Scoring weights (adjust based on importance)
 WEIGHTS = {
     'startup_cost': 0.25,
@@ -29,38 +92,117 @@ WEIGHTS = {
     'task_preference': 0.07
 }
 
+# Upper bound on in-flight OpenAI requests when businesses are scored concurrently
+OPENAI_MAX_CONCURRENCY = 20
+_openai_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+
+# Industry categories used by the schedule, tech and task scorers
+_WEEKEND_BUSINESSES = frozenset({'Events', 'Event Planning', 'Street Vending', 'Hospitality'})
+_FLEXIBLE_BUSINESSES = frozenset({'E-Commerce', 'Print-on-Demand', 'Technology', 'Online Services'})
+_WEEKDAY_BUSINESSES = frozenset({'B2B Services', 'Automotive', 'Consulting'})
+
+_HIGH_TECH = frozenset({'E-Commerce', 'Technology', 'Print-on-Demand', 'Digital Services', 'AI'})
+_MODERATE_TECH = frozenset({'Marketing', 'Retail', 'Hospitality', 'Consulting'})
+_LOW_TECH = frozenset({'Street Vending', 'Food & Beverage', 'Physical Services', 'Cleaning'})
+
+_TASK_PREFERENCE_INDUSTRIES = {
+    'creative': frozenset({'E-Commerce', 'Marketing', 'Apparel', 'Technology', 'Design', 'Content'}),
+    'structured': frozenset({'B2B Services', 'Automotive', 'Maintenance', 'Cleaning', 'Bookkeeping'}),
+    'analytical': frozenset({'Technology', 'Retail', 'E-Commerce', 'Data', 'Consulting'}),
+    'social': frozenset({'Events', 'Hospitality', 'Street Vending', 'Sales', 'Coaching'})
+}
+
+# Every industry the scorers know about gets one bit; a business's industries
+# collapse to one int so category checks are a single AND. Names are interned, as are
+# business industries at ingest, so the lookup below matches on identity
+INDUSTRY_ID = {sys.intern(name): i for i, name in enumerate(sorted(
+    _WEEKEND_BUSINESSES | _FLEXIBLE_BUSINESSES | _WEEKDAY_BUSINESSES
+    | _HIGH_TECH | _MODERATE_TECH | _LOW_TECH
+    | frozenset().union(*_TASK_PREFERENCE_INDUSTRIES.values())
+))}
+
+
+def industry_mask(industries) -> int:
+    """Bitmask of the known industries in the list (unknown names set no bit)"""
+    mask = 0
+    for ind in industries or ():
+        bit = INDUSTRY_ID.get(ind)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def repeated_industry_mask(industries) -> int:
+    """Bits of the known industries listed more than once
+    
+    Task preference counts list entries, so a repeated preferred industry counts twice.
+    """
+    seen = repeated = 0
+    for ind in industries or ():
+        bit = INDUSTRY_ID.get(ind)
+        if bit is not None:
+            repeated |= seen & (1 << bit)
+            seen |= 1 << bit
+    return repeated
+
+
+_WEEKEND_MASK = industry_mask(_WEEKEND_BUSINESSES)
+_FLEXIBLE_MASK = industry_mask(_FLEXIBLE_BUSINESSES)
+_WEEKDAY_MASK = industry_mask(_WEEKDAY_BUSINESSES)
+_HIGH_TECH_MASK = industry_mask(_HIGH_TECH)
+_MODERATE_TECH_MASK = industry_mask(_MODERATE_TECH)
+_LOW_TECH_MASK = industry_mask(_LOW_TECH)
+_TASK_PREFERENCE_MASKS = {pref: industry_mask(inds) for pref, inds in _TASK_PREFERENCE_INDUSTRIES.items()}
+
+# Terms that make a business conflict with each avoidance answer
+AVOIDANCE_MAP = {
+    'door': ['Sales', 'Door-to-Door', 'door-to-door', 'canvassing'],
+    'heavy': ['Physical Services', 'Heavy Labor', 'Construction', 'Moving', 'labor'],
+    'nights': ['Street Vending', 'Events', 'late night', 'nightclub'],
+    'delivery': ['Delivery', 'Mobile Services', 'courier', 'food delivery'],
+    'children': ['Child Care', 'Education', 'Kids', 'Tutoring', 'children']
+}
+
 
+# '1000–3000', '500 to 1000' or a single '250' once $ and , are stripped
+COST_RE = re.compile(r'\s*(\d+)\s*(?:–|-|to)\s*(\d+)\s*|\s*(\d+)\s*')
+
+
+@lru_cache(maxsize=4096)
 def parse_cost_range(cost_str: str) -> Tuple[int, int]:
-    """Extract min and max from cost string like '$1,000–$3,000'"""
+    """Extract min and max from cost string like '$1,000–$3,000'
+    
+    Memoized: catalogues reuse a small set of cost strings, so most calls are a dict hit.
+    """
     if not cost_str:
         return 0, 0
     
-    # Handle both regular dash and em-dash
-    cost_str = cost_str.replace('$', '').replace(',', '').strip()
-    
-    # Try splitting with different separators
-    for separator in ['–', '-', 'to']:
-        if separator in cost_str:
-            parts = cost_str.split(separator)
-            if len(parts) == 2:
-                try:
-                    min_val = int(parts[0].strip())
-                    max_val = int(parts[1].strip())
-                    return min_val, max_val
-                except (ValueError, AttributeError):
-                    pass
-    
-    # Single value or unparseable
-    try:
-        single_val = int(cost_str)
-        return single_val, single_val
-    except:
+    match = COST_RE.fullmatch(cost_str.replace('$', '').replace(',', ''))
+    if match is None:
+        # Unparseable (including signed values, which a cost range can't be)
         return 0, 0
+    if match.group(3) is not None:
+        single_val = int(match.group(3))
+        return single_val, single_val
+    return int(match.group(1)), int(match.group(2))
+
+
+def stored_range(business: Dict, column_prefix: str, text_field: str) -> Tuple[int, int]:
+    """Read a parsed (min, max) range from the generated *_min/*_max columns
+    
+    Falls back to parsing the display string for rows loaded without them.
+    """
+    min_val = business.get(f'{column_prefix}_min')
+    max_val = business.get(f'{column_prefix}_max')
+    if min_val is None or max_val is None:
+        return parse_cost_range(business.get(text_field, ''))
+    return min_val, max_val
 
 
-def score_startup_cost(user_budget: int, business_cost_str: str) -> float:
+def score_startup_cost(user_budget: int, business_cost_str: str,
+                       cost_range: Optional[Tuple[int, int]] = None) -> float:
     """Score based on whether user can afford the business"""
-    min_cost, max_cost = parse_cost_range(business_cost_str)
+    min_cost, max_cost = cost_range if cost_range is not None else parse_cost_range(business_cost_str)
     
     if min_cost == 0 and max_cost == 0:
         # No cost data - assume affordable for most
@@ -82,7 +224,19 @@ def score_startup_cost(user_budget: int, business_cost_str: str) -> float:
         return 0.1
 
 
-def score_time_commitment(user_hours: int, business_level: str) -> float:
+HOURS_MAP = {0: 5, 1: 10, 2: 20, 3: 30}
+
+LEVEL_HOURS = {
+    'Beginner': 10,
+    'Intermediate': 15,
+    'Beginner to Intermediate': 12,
+    'Advanced': 20,
+    '': 15  # default
+}
+
+
+def score_time_commitment(user_hours: int, business_level: str,
+                          required_hours: Optional[int] = None) -> float:
     """Score based on time availability vs business requirements
     
     user_hours mapping:
@@ -90,21 +244,14 @@ def score_time_commitment(user_hours: int, business_level: str) -> float:
     1 = 10 hours/week
     2 = 20 hours/week
     3 = 30 hours/week
+    required_hours: precomputed LEVEL_HOURS value for business_level (_level_hours)
     """
     # Map user hours integer to actual hours
-    hours_map = {0: 5, 1: 10, 2: 20, 3: 30}
-    actual_hours = hours_map.get(user_hours, 10)
+    actual_hours = HOURS_MAP.get(user_hours, 10)
     
     # Estimate hours needed based on skill level
-    level_hours = {
-        'Beginner': 10,
-        'Intermediate': 15,
-        'Beginner to Intermediate': 12,
-        'Advanced': 20,
-        '': 15  # default
-    }
-    
-    required_hours = level_hours.get(business_level, 15)
+    if required_hours is None:
+        required_hours = LEVEL_HOURS.get(business_level, 15)
     
     if actual_hours >= required_hours * 1.5:
         return 1.0
@@ -116,46 +263,93 @@ def score_time_commitment(user_hours: int, business_level: str) -> float:
         return 0.3
 
 
-def score_skill_match_ai(user_background: str, user_skills: List[str], 
-                         business_industries: List[str], business_title: str,
-                         business_description: str, willing_to_learn: str) -> float:
-    """Use AI to score skill match between user and business"""
+def skill_match_system_prompt(user_background: str, user_skills: List[str], willing_to_learn: str,
+                              batch: bool = False) -> str:
+    """Instructions plus the user profile, everything that is the same for every business
     
+    Sent as the system message so all calls in a request share a byte-identical prefix
+    that OpenAI's prompt caching can reuse; only the business text goes in the user message.
+    """
     skills_text = ', '.join(user_skills) if user_skills else 'None specified'
-    industries_text = ', '.join(business_industries) if business_industries else 'Various'
+    if batch:
+        target = 'each business'
+        answer = ('Return ONLY a JSON object mapping each business id to a decimal between 0.0 and 1.0, '
+                  'like: {"0": 0.75, "1": 0.4}')
+    else:
+        target = 'the business'
+        answer = 'Return ONLY a JSON object with a decimal score between 0.0 and 1.0, like: {"score": 0.75}'
     
-    prompt = f"""Rate the skill match between this user and business on a 0-1 scale.
+    return f"""You are a career matching expert. Rate the skill match between this user and {target} on a 0-1 scale.
 
 USER PROFILE:
 - Background: {user_background}
 - Skills: {skills_text}
 - Willing to learn new skills: {willing_to_learn}
 
-BUSINESS:
-- Title: {business_title}
-- Industries: {industries_text}
-- Description: {business_description[:400] if business_description else 'No description available'}
-
 Consider:
 1. Direct skill overlap (0.4 weight)
 2. Transferable skills (0.3 weight)
 3. Learning curve feasibility based on willingness to learn (0.3 weight)
 
-Return ONLY a decimal number between 0.0 and 1.0, like: 0.75"""
+{answer}"""
+
+
+def skill_score_response_format(keys: List[str]) -> Dict[str, Any]:
+    """Structured output schema: an object with exactly these keys, each a number
+    
+    The model can't answer with prose or leave a key out, so the reply always parses.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "skill_scores",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {key: {"type": "number"} for key in keys},
+                "required": list(keys),
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+_SINGLE_SCORE_FORMAT = skill_score_response_format(['score'])
+
+
+def skill_match_messages(user_background: str, user_skills: List[str],
+                         business_industries: List[str], business_title: str,
+                         business_description: str, willing_to_learn: str) -> List[Dict[str, str]]:
+    """Chat messages for the skill match prompt"""
+    
+    industries_text = ', '.join(business_industries) if business_industries else 'Various'
+    
+    return [
+        {"role": "system", "content": skill_match_system_prompt(user_background, user_skills, willing_to_learn)},
+        {"role": "user", "content": f"""BUSINESS:
+- Title: {business_title}
+- Industries: {industries_text}
+- Description: {business_description[:400] if business_description else 'No description available'}"""}
+    ]
+
+
+def score_skill_match_ai(user_background: str, user_skills: List[str], 
+                         business_industries: List[str], business_title: str,
+                         business_description: str, willing_to_learn: str) -> float:
+    """Use AI to score skill match between user and business"""
     
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a career matching expert. Return only a decimal number between 0.0 and 1.0."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=10
-        )
+        with _openai_semaphore:
+            response = get_openai().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=skill_match_messages(user_background, user_skills, business_industries,
+                                              business_title, business_description, willing_to_learn),
+                response_format=_SINGLE_SCORE_FORMAT,
+                temperature=0.3,
+                max_tokens=12
+            )
         
-        score_text = response.choices[0].message.content.strip()
-        score = float(score_text)
+        score = float(orjson.loads(response.choices[0].message.content)['score'])
         return max(0.0, min(1.0, score))
     except Exception as e:
         print(f"AI scoring error: {e}")
@@ -163,13 +357,184 @@ Return ONLY a decimal number between 0.0 and 1.0, like: 0.75"""
         return basic_skill_match(user_background, user_skills, business_title, business_industries)
 
 
-def basic_skill_match(background: str, skills: List[str], title: str, industries: List[str]) -> float:
-    """Fallback keyword-based skill matching"""
-    background_lower = background.lower() if background else ''
-    title_lower = title.lower() if title else ''
-    industries_lower = [ind.lower() for ind in industries] if industries else []
-    skills_lower = [skill.lower() for skill in skills] if skills else []
+# Rate limits, timeouts and 5xx are retried by the SDK with exponential backoff
+OPENAI_MAX_RETRIES = 3
+
+_async_loop = None
+_async_openai_client = None
+_async_openai_semaphore = None
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread, shared by every request on this instance
     
+    The AsyncOpenAI connection pool is bound to the loop it runs on, so keeping one
+    loop alive (instead of asyncio.run per request) lets warm invocations reuse it.
+    """
+    global _async_loop
+    if _async_loop is None:
+        with _openai_client_lock:
+            if _async_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='openai-async', daemon=True).start()
+                _async_loop = loop
+    return _async_loop
+
+
+def get_async_openai() -> openai.AsyncOpenAI:
+    """Shared AsyncOpenAI client; only await it on _get_async_loop()"""
+    global _async_openai_client
+    if _async_openai_client is None:
+        with _openai_client_lock:
+            if _async_openai_client is None:
+                _async_openai_client = openai.AsyncOpenAI(
+                    api_key=openai.api_key,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=httpx.AsyncClient(
+                        http2=True, timeout=15,
+                        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+                    )
+                )
+    return _async_openai_client
+
+
+# Businesses rated per chat completion; the user profile is sent once per batch
+SKILL_BATCH_SIZE = 20
+
+
+def skill_match_batch_messages(system_prompt: str, businesses: List[Dict]) -> List[Dict[str, str]]:
+    """Chat messages rating several businesses at once, keyed by their position in the batch
+    
+    system_prompt: skill_match_system_prompt(..., batch=True), built once per request
+    """
+    listing = orjson.dumps([{
+        'id': str(i),
+        'title': business.get('title', ''),
+        'industries': ', '.join(business.get('industry') or []) or 'Various',
+        'desc': (business.get('description') or 'No description available')[:400]
+    } for i, business in enumerate(businesses)]).decode()
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"BUSINESSES:\n{listing}"}
+    ]
+
+
+async def score_skill_match_ai_batch_async(client: openai.AsyncOpenAI, semaphore: asyncio.Semaphore,
+                                           user_data: Dict, system_prompt: str,
+                                           businesses: List[Dict]) -> List[float]:
+    """AI skill match for one batch of businesses in a single structured-output completion
+    
+    Businesses missing from the reply (or the whole batch, if the call fails) use basic_skill_match.
+    """
+    parsed = {}
+    try:
+        async with semaphore:
+            response = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=skill_match_batch_messages(system_prompt, businesses),
+                response_format=skill_score_response_format([str(i) for i in range(len(businesses))]),
+                temperature=0.3,
+                max_tokens=12 * len(businesses) + 20
+            )
+        parsed = orjson.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"AI scoring error: {e}")
+    
+    scores = []
+    missing = []
+    for i in range(len(businesses)):
+        try:
+            scores.append(max(0.0, min(1.0, float(parsed[str(i)]))))
+        except (KeyError, TypeError, ValueError):
+            scores.append(None)
+            missing.append(i)
+    
+    if missing:
+        # Fallback to basic keyword matching, lowercasing the user's profile once for the batch
+        fallback = basic_skill_matches(user_data.get('background', ''), user_data.get('skills', []),
+                                       [businesses[i] for i in missing])
+        for i, score in zip(missing, fallback):
+            scores[i] = score
+    return scores
+
+
+async def score_skill_matches_async(user_data: Dict, businesses: List[Dict]) -> List[float]:
+    """AI skill match for every business, SKILL_BATCH_SIZE per call with batches in parallel"""
+    global _async_openai_semaphore
+    if _async_openai_semaphore is None:
+        # Instance-wide, so concurrent requests share the OPENAI_MAX_CONCURRENCY budget
+        _async_openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    system_prompt = skill_match_system_prompt(user_data.get('background', ''), user_data.get('skills', []),
+                                              user_data.get('willing_to_learn', 'possible'), batch=True)
+    batches = await asyncio.gather(*[
+        score_skill_match_ai_batch_async(get_async_openai(), _async_openai_semaphore, user_data, system_prompt,
+                                         businesses[i:i + SKILL_BATCH_SIZE])
+        for i in range(0, len(businesses), SKILL_BATCH_SIZE)
+    ])
+    return [score for batch in batches for score in batch]
+
+
+def run_on_async_loop(coro):
+    """Run a coroutine on the shared event loop and block until it finishes"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_async_loop()).result()
+
+
+def score_skill_matches(user_data: Dict, businesses: List[Dict]) -> List[float]:
+    """Blocking entry point for the HTTP handler, runs on the shared event loop"""
+    if not businesses:
+        return []
+    return run_on_async_loop(score_skill_matches_async(user_data, businesses))
+
+
+def precompute_text_fields(business: Dict) -> Dict:
+    """Store lowercased/tokenized copies of the text fields and the industry bitmasks
+    
+    Run once per business after loading so scoring doesn't redo this per scorer.
+    """
+    if business.get('industry'):
+        # Thousands of rows repeat the same few names; keep one copy of each
+        business['industry'] = [sys.intern(ind) for ind in business['industry']]
+    business['_title_lower'] = (business.get('title') or '').lower()
+    business['_industries_lower'] = tuple(ind.lower() for ind in business.get('industry') or [])
+    business['_skill_text'], business['_title_keywords'] = _skill_match_fields(business['_title_lower'],
+                                                                               business['_industries_lower'])
+    business['_ind_mask'] = industry_mask(business.get('industry'))
+    business['_repeat_mask'] = repeated_industry_mask(business.get('industry'))
+    business['_desc_lower'] = (business.get('description') or '')[:400].lower()
+    business['_avoid_text'] = avoidance_text(business['_industries_lower'], business['_title_lower'],
+                                             business['_desc_lower'])
+    business['_avoid_mask'] = business_avoidance_mask(business['_avoid_text'])
+    return business
+
+
+def precompute_business_fields(business: Dict) -> Dict:
+    """precompute_text_fields() plus the parsed ranges and every user-independent level
+    
+    Stores _cost_range, _profit_range, _level_hours, _risk_level and _tech_level so
+    per-request scoring never re-parses cost strings or re-derives levels.
+    """
+    precompute_text_fields(business)
+    business['_cost_range'] = stored_range(business, 'startup_cost', 'startup_cost')
+    business['_profit_range'] = stored_range(business, 'monthly_profit', 'estimated_monthly_profit')
+    business['_level_hours'] = LEVEL_HOURS.get(business.get('skill_level', 'Intermediate'), 15)
+    business['_risk_level'] = business_risk_level(business['_profit_range'], business['_cost_range'])
+    business['_tech_level'] = business_tech_level(business.get('industry') or [], business['_ind_mask'])
+    return business
+
+
+def _skill_match_fields(title_lower: str, industries_lower) -> Tuple[str, Tuple[str, ...]]:
+    """(title and industries joined for substring search, title words long enough to count)
+    
+    Joined on NUL so a skill can only match inside one of them, as when each is searched alone.
+    """
+    skill_text = '\0'.join((title_lower, *industries_lower))
+    title_keywords = tuple(word for word in title_lower.split() if len(word) > 4)
+    return skill_text, title_keywords
+
+
+def _basic_skill_score(background_lower: str, skills_lower: List[str], industries_lower,
+                       skill_text: str, title_keywords) -> float:
     matches = 0
     
     # Check for direct industry matches in background
@@ -179,57 +544,99 @@ def basic_skill_match(background: str, skills: List[str], title: str, industries
     
     # Check for skill matches in title or industries
     for skill in skills_lower:
-        if skill in title_lower or any(skill in ind for ind in industries_lower):
+        if skill in skill_text:
             matches += 1
     
     # Check for related keywords in title
-    title_words = title_lower.split()
-    for word in title_words:
-        if len(word) > 4 and word in background_lower:
+    for word in title_keywords:
+        if word in background_lower:
             matches += 0.5
     
     return min(1.0, matches * 0.25)
 
 
-def score_schedule_fit(user_schedule: str, business_industries: List[str]) -> float:
+def basic_skill_match(background: str, skills: List[str], title: str, industries: List[str],
+                      business: Optional[Dict] = None) -> float:
+    """Fallback keyword-based skill matching
+    
+    Pass a business that went through precompute_text_fields() to reuse its lowercased fields.
+    """
+    background_lower = background.lower() if background else ''
+    skills_lower = [skill.lower() for skill in skills] if skills else []
+    if business is not None and '_skill_text' in business:
+        return _basic_skill_score(background_lower, skills_lower, business['_industries_lower'],
+                                  business['_skill_text'], business['_title_keywords'])
+    
+    industries_lower = [ind.lower() for ind in industries] if industries else []
+    skill_text, title_keywords = _skill_match_fields(title.lower() if title else '', industries_lower)
+    return _basic_skill_score(background_lower, skills_lower, industries_lower, skill_text, title_keywords)
+
+
+def basic_skill_matches(background: str, skills: List[str], businesses: List[Dict]) -> List[float]:
+    """basic_skill_match() for every business, lowercasing the user's profile once"""
+    background_lower = background.lower() if background else ''
+    skills_lower = [skill.lower() for skill in skills] if skills else []
+    for b in businesses:
+        if '_skill_text' not in b:
+            precompute_text_fields(b)
+    return [_basic_skill_score(background_lower, skills_lower, b['_industries_lower'],
+                               b['_skill_text'], b['_title_keywords'])
+            for b in businesses]
+
+
+# (industries that suit the schedule, score with one of them, score without)
+_SCHEDULE_FIT = {
+    'flexible': (0, 1.0, 1.0),
+    'weekends': (_WEEKEND_MASK, 0.9, 0.5),
+    'weekdays': (_WEEKDAY_MASK, 0.9, 0.6),
+    'evenings': (_FLEXIBLE_MASK, 0.8, 0.5),
+    'early': (0, 0.7, 0.7)
+}
+_SCHEDULE_FIT_DEFAULT = (0, 0.6, 0.6)
+
+
+def schedule_fit_scores(user_schedule: str) -> Tuple[int, float, float]:
+    """(industry mask, score on a match, score otherwise) for a work_schedule answer"""
+    return _SCHEDULE_FIT.get(user_schedule, _SCHEDULE_FIT_DEFAULT)
+
+
+def score_schedule_fit(user_schedule: str, business_industries: List[str],
+                       ind_mask: Optional[int] = None) -> float:
     """Score based on schedule compatibility
     
     user_schedule values: flexible, weekends, weekdays, evenings, early
+    ind_mask: precomputed industry_mask(business_industries)
     """
     if not business_industries:
         return 0.7
     
-    # Businesses that typically require specific schedules
-    weekend_businesses = ['Events', 'Event Planning', 'Street Vending', 'Hospitality']
-    flexible_businesses = ['E-Commerce', 'Print-on-Demand', 'Technology', 'Online Services']
-    weekday_businesses = ['B2B Services', 'Automotive', 'Consulting']
+    if ind_mask is None:
+        ind_mask = industry_mask(business_industries)
     
-    if user_schedule == 'flexible':
-        return 1.0
-    elif user_schedule == 'weekends':
-        return 0.9 if any(ind in weekend_businesses for ind in business_industries) else 0.5
-    elif user_schedule == 'weekdays':
-        return 0.9 if any(ind in weekday_businesses for ind in business_industries) else 0.6
-    elif user_schedule == 'evenings':
-        return 0.8 if any(ind in flexible_businesses for ind in business_industries) else 0.5
-    elif user_schedule == 'early':
-        return 0.7
-    
-    return 0.6
+    schedule_mask, hit, miss = schedule_fit_scores(user_schedule)
+    return hit if ind_mask & schedule_mask else miss
 
 
-def score_risk_tolerance(user_risk: str, business_profit_str: str, 
-                         business_cost_str: str) -> float:
-    """Score based on risk alignment
-    
-    user_risk values: high, moderate, low, very_low
-    """
-    min_profit, max_profit = parse_cost_range(business_profit_str)
-    min_cost, max_cost = parse_cost_range(business_cost_str)
+RISK_LEVELS = ['very_low', 'low', 'moderate', 'high', 'very_high']
+_RISK_LEVEL = {level: i for i, level in enumerate(RISK_LEVELS)}
+
+# Score by level difference (0, 1, 2, 3+) for risk and tech alignment
+_RISK_DIFF_SCORES = (1.0, 0.7, 0.4, 0.2)
+_TECH_DIFF_SCORES = (1.0, 0.7, 0.4, 0.1)
+
+
+def user_risk_level(user_risk: str) -> int:
+    """Index of the user's answer in RISK_LEVELS (moderate if unknown)"""
+    return _RISK_LEVEL.get(user_risk, 2)
+
+
+def business_risk_level(profit_range: Tuple[int, int], cost_range: Tuple[int, int]) -> int:
+    """Index in RISK_LEVELS from months to break even, UNKNOWN_LEVEL without cost/profit data"""
+    min_profit, max_profit = profit_range
+    min_cost, max_cost = cost_range
     
     if min_profit == 0 or min_cost == 0:
-        # Insufficient data - neutral score
-        return 0.6
+        return scoring_kernel.UNKNOWN_LEVEL
     
     # Calculate risk ratio (higher investment with uncertain returns = higher risk)
     avg_cost = (min_cost + max_cost) / 2
@@ -239,100 +646,94 @@ def score_risk_tolerance(user_risk: str, business_profit_str: str,
     
     # Map business risk based on break-even time
     if months_to_break_even <= 1:
-        business_risk = 'low'
+        return _RISK_LEVEL['low']
     elif months_to_break_even <= 3:
-        business_risk = 'moderate'
+        return _RISK_LEVEL['moderate']
     elif months_to_break_even <= 6:
-        business_risk = 'high'
+        return _RISK_LEVEL['high']
     else:
-        business_risk = 'very_high'
+        return _RISK_LEVEL['very_high']
+
+
+def score_risk_tolerance(user_risk: str, business_profit_str: str, 
+                         business_cost_str: str,
+                         profit_range: Optional[Tuple[int, int]] = None,
+                         cost_range: Optional[Tuple[int, int]] = None) -> float:
+    """Score based on risk alignment
     
-    # Score alignment
-    risk_levels = ['very_low', 'low', 'moderate', 'high', 'very_high']
+    user_risk values: high, moderate, low, very_low
+    """
+    if profit_range is None:
+        profit_range = parse_cost_range(business_profit_str)
+    if cost_range is None:
+        cost_range = parse_cost_range(business_cost_str)
     
-    try:
-        user_level = risk_levels.index(user_risk)
-    except ValueError:
-        user_level = 2  # default to moderate
+    business_level = business_risk_level(profit_range, cost_range)
+    if business_level == scoring_kernel.UNKNOWN_LEVEL:
+        # Insufficient data - neutral score
+        return 0.6
     
-    try:
-        business_level = risk_levels.index(business_risk)
-    except ValueError:
-        business_level = 2
+    diff = abs(user_risk_level(user_risk) - business_level)
+    return _RISK_DIFF_SCORES[min(diff, 3)]
+
+
+USER_TECH_MAP = {'very': 3, 'moderate': 2, 'minimal': 1, 'none': 0}
+
+
+def business_tech_level(business_industries: List[str], ind_mask: Optional[int] = None) -> int:
+    """Tech level 1-3 implied by the industries, UNKNOWN_LEVEL when there are none"""
+    if not business_industries:
+        return scoring_kernel.UNKNOWN_LEVEL
     
-    diff = abs(user_level - business_level)
+    if ind_mask is None:
+        ind_mask = industry_mask(business_industries)
     
-    if diff == 0:
-        return 1.0
-    elif diff == 1:
-        return 0.7
-    elif diff == 2:
-        return 0.4
+    if ind_mask & _HIGH_TECH_MASK:
+        return 3
+    elif ind_mask & _MODERATE_TECH_MASK:
+        return 2
+    elif ind_mask & _LOW_TECH_MASK:
+        return 1
     else:
-        return 0.2
+        return 2  # default
 
 
 def score_tech_comfort(user_tech: str, business_industries: List[str], 
-                       business_title: str) -> float:
+                       business_title: str, ind_mask: Optional[int] = None) -> float:
     """Score based on technology requirements
     
     user_tech values: very, moderate, minimal, none
     """
-    if not business_industries:
+    business_level = business_tech_level(business_industries, ind_mask)
+    if business_level == scoring_kernel.UNKNOWN_LEVEL:
         return 0.7
     
-    high_tech = ['E-Commerce', 'Technology', 'Print-on-Demand', 'Digital Services', 'AI']
-    moderate_tech = ['Marketing', 'Retail', 'Hospitality', 'Consulting']
-    low_tech = ['Street Vending', 'Food & Beverage', 'Physical Services', 'Cleaning']
-    
-    # Determine business tech level
-    if any(ind in high_tech for ind in business_industries):
-        business_tech_level = 3
-    elif any(ind in moderate_tech for ind in business_industries):
-        business_tech_level = 2
-    elif any(ind in low_tech for ind in business_industries):
-        business_tech_level = 1
-    else:
-        business_tech_level = 2  # default
-    
-    # Map user comfort
-    user_tech_map = {'very': 3, 'moderate': 2, 'minimal': 1, 'none': 0}
-    user_tech_level = user_tech_map.get(user_tech, 2)
-    
-    diff = abs(user_tech_level - business_tech_level)
-    
-    if diff == 0:
-        return 1.0
-    elif diff == 1:
-        return 0.7
-    elif diff == 2:
-        return 0.4
-    else:
-        return 0.1
+    diff = abs(USER_TECH_MAP.get(user_tech, 2) - business_level)
+    return _TECH_DIFF_SCORES[min(diff, 3)]
 
 
 def score_task_preference(user_preference: str, business_industries: List[str],
-                          business_description: str) -> float:
+                          business_description: str, ind_mask: Optional[int] = None,
+                          repeat_mask: Optional[int] = None) -> float:
     """Score based on task type preferences
     
     user_preference values: creative, structured, analytical, social, mixed
+    ind_mask, repeat_mask: precomputed industry_mask() and repeated_industry_mask()
     """
     if not business_industries:
         return 0.7
     
     # Map preferences to business types
-    if user_preference == 'creative':
-        preferred = ['E-Commerce', 'Marketing', 'Apparel', 'Technology', 'Design', 'Content']
-    elif user_preference == 'structured':
-        preferred = ['B2B Services', 'Automotive', 'Maintenance', 'Cleaning', 'Bookkeeping']
-    elif user_preference == 'analytical':
-        preferred = ['Technology', 'Retail', 'E-Commerce', 'Data', 'Consulting']
-    elif user_preference == 'social':
-        preferred = ['Events', 'Hospitality', 'Street Vending', 'Sales', 'Coaching']
-    else:  # mixed or all
+    preferred_mask = _TASK_PREFERENCE_MASKS.get(user_preference)
+    if preferred_mask is None:  # mixed or all
         return 0.8
     
-    match_count = sum(1 for ind in business_industries if ind in preferred)
+    if ind_mask is None:
+        ind_mask = industry_mask(business_industries)
+    if repeat_mask is None:
+        repeat_mask = repeated_industry_mask(business_industries)
+    # One per matching entry: distinct matches, plus one more for each repeated one
+    match_count = (ind_mask & preferred_mask).bit_count() + (repeat_mask & preferred_mask).bit_count()
     
     if match_count >= 2:
         return 1.0
@@ -342,93 +743,335 @@ def score_task_preference(user_preference: str, business_industries: List[str],
         return 0.4
 
 
+def _terms_pattern(terms) -> Pattern:
+    # Longest first so overlapping terms ('delivery' / 'food delivery') still match as substrings
+    terms = {term.lower() for term in terms}
+    return re.compile('|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+# One compiled pattern per avoidance answer, built at import
+AVOIDANCE_RE = {avoidance: _terms_pattern(terms) for avoidance, terms in AVOIDANCE_MAP.items()}
+
+
+@lru_cache(maxsize=64)
+def _combined_avoidance_pattern(avoidances: frozenset) -> Optional[Pattern]:
+    known = sorted(avoidances & AVOIDANCE_RE.keys())
+    if not known:
+        return None
+    if len(known) == 1:
+        return AVOIDANCE_RE[known[0]]
+    return _terms_pattern(term for avoidance in known for term in AVOIDANCE_MAP[avoidance])
+
+
+def build_avoidance_pattern(user_avoidances: List[str]) -> Optional[Pattern]:
+    """Regex matching the terms for all of the user's avoidances
+    
+    Returns None when nothing needs to be avoided. Patterns are memoized per
+    combination of answers, so each business is still scanned in one pass.
+    """
+    if not user_avoidances or 'none' in user_avoidances:
+        return None
+    return _combined_avoidance_pattern(frozenset(user_avoidances))
+
+
+# One bit per avoidance answer; a business's conflicts are found once at ingest, so the
+# per-request check is an AND against the user's answers instead of a text scan
+AVOIDANCE_BIT = {avoidance: 1 << i for i, avoidance in enumerate(AVOIDANCE_MAP)}
+
+
+def business_avoidance_mask(combined_text: str) -> int:
+    """Bits of every avoidance answer whose terms appear in the business's avoidance_text()"""
+    mask = 0
+    for avoidance, pattern in AVOIDANCE_RE.items():
+        if pattern.search(combined_text):
+            mask |= AVOIDANCE_BIT[avoidance]
+    return mask
+
+
+def user_avoidance_mask(user_avoidances: List[str]) -> int:
+    """Bits of the user's avoidance answers (0 when nothing needs to be avoided)"""
+    if not user_avoidances or 'none' in user_avoidances:
+        return 0
+    mask = 0
+    for avoidance in user_avoidances:
+        mask |= AVOIDANCE_BIT.get(avoidance, 0)
+    return mask
+
+
+def avoidance_text(business_industries: List[str], business_title: str, business_description: str) -> str:
+    """The text avoidance terms are searched in: industries, title and the start of the description"""
+    combined_text = ' '.join(business_industries) + ' ' + business_title
+    if business_description:
+        combined_text += ' ' + business_description[:200]
+    return combined_text
+
+
 def check_avoidance_criteria(user_avoidances: List[str], 
                              business_industries: List[str],
                              business_title: str,
-                             business_description: str) -> bool:
+                             business_description: str,
+                             avoid_pattern: Optional[Pattern] = None,
+                             combined_text: Optional[str] = None) -> bool:
     """Check if business conflicts with what user wants to avoid
     
     user_avoidances values: door, heavy, nights, delivery, children, none
+    combined_text: precomputed avoidance_text() for the business (_avoid_text)
     """
     if not user_avoidances or 'none' in user_avoidances:
         return True
     
-    avoidance_map = {
-        'door': ['Sales', 'Door-to-Door', 'door-to-door', 'canvassing'],
-        'heavy': ['Physical Services', 'Heavy Labor', 'Construction', 'Moving', 'labor'],
-        'nights': ['Street Vending', 'Events', 'late night', 'nightclub'],
-        'delivery': ['Delivery', 'Mobile Services', 'courier', 'food delivery'],
-        'children': ['Child Care', 'Education', 'Kids', 'Tutoring', 'children']
+    if avoid_pattern is None:
+        avoid_pattern = build_avoidance_pattern(user_avoidances)
+        if avoid_pattern is None:
+            # None of the answers has terms to avoid
+            return True
+    
+    if combined_text is None:
+        combined_text = avoidance_text(business_industries, business_title, business_description)
+    
+    return avoid_pattern.search(combined_text) is None
+
+
+class UserCodes(NamedTuple):
+    """A user's quiz answers reduced to the numbers the batch scorers compare against"""
+    budget: float
+    hours: int
+    risk: int
+    tech: int
+    schedule_mask: int
+    schedule_hit: float
+    schedule_miss: float
+    task_mask: int
+    avoid_mask: int
+
+
+def user_codes(user_data: Dict) -> UserCodes:
+    """Decode the answers once per user, with the same defaults as the scalar scorers"""
+    schedule_mask, schedule_hit, schedule_miss = schedule_fit_scores(user_data.get('work_schedule', 'flexible'))
+    return UserCodes(
+        budget=user_data.get('investment_budget', 0),
+        hours=HOURS_MAP.get(user_data.get('weekly_hours', 1), 10),
+        risk=user_risk_level(user_data.get('risk_tolerance', 'moderate')),
+        tech=USER_TECH_MAP.get(user_data.get('tech_comfort', 'moderate'), 2),
+        schedule_mask=schedule_mask,
+        schedule_hit=schedule_hit,
+        schedule_miss=schedule_miss,
+        task_mask=_TASK_PREFERENCE_MASKS.get(user_data.get('task_preference', 'mixed'), 0),
+        avoid_mask=user_avoidance_mask(user_data.get('avoidances', []))
+    )
+
+
+# WEIGHTS in the order the kernel takes them
+_KERNEL_WEIGHTS = np.array([WEIGHTS[key] for key in scoring_kernel.WEIGHTED], dtype=np.float64)
+
+
+def business_arrays(businesses: List[Dict]) -> Dict[str, np.ndarray]:
+    """Column arrays of the user-independent kernel inputs, one entry per business"""
+    for b in businesses:
+        if '_cost_range' not in b:
+            precompute_business_fields(b)
+    
+    return {
+        'min_cost': np.array([b['_cost_range'][0] for b in businesses], dtype=np.float64),
+        'max_cost': np.array([b['_cost_range'][1] for b in businesses], dtype=np.float64),
+        'level_hours': np.array([b['_level_hours'] for b in businesses], dtype=np.float64),
+        'tech_lvl': np.array([b['_tech_level'] for b in businesses], dtype=np.int64),
+        'risk_lvl': np.array([b['_risk_level'] for b in businesses], dtype=np.int64),
+        'ind_mask': np.array([b['_ind_mask'] if b.get('industry') else scoring_kernel.NO_INDUSTRIES
+                              for b in businesses], dtype=np.int64),
+        'repeat_mask': np.array([b['_repeat_mask'] for b in businesses], dtype=np.int64),
+        'avoid_mask': np.array([b['_avoid_mask'] for b in businesses], dtype=np.int64)
     }
+
+
+def score_numeric_components(user_data: Dict, businesses: List[Dict],
+                             arrays: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, float]]:
+    """Every component except skill_match for every business in one kernel call
     
-    combined_text = ' '.join(business_industries).lower() + ' ' + business_title.lower()
-    if business_description:
-        combined_text += ' ' + business_description[:200].lower()
+    arrays: business_arrays(businesses), e.g. the copy cached with the published blueprints
+    """
+    if not businesses:
+        return []
     
-    for avoidance in user_avoidances:
-        conflicting_terms = avoidance_map.get(avoidance, [])
-        for term in conflicting_terms:
-            if term.lower() in combined_text:
-                return False
+    if arrays is None:
+        arrays = business_arrays(businesses)
     
-    return True
+    components, _ = score_arrays(user_codes(user_data), arrays)
+    return [dict(zip(scoring_kernel.COMPONENTS, row)) for row in components.tolist()]
 
 
-def calculate_business_score(user_data: Dict, business: Dict, use_ai: bool = True) -> Dict[str, Any]:
-    """Calculate comprehensive score for a business"""
+def score_arrays(user: UserCodes, arrays: Dict[str, np.ndarray],
+                 skill: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Kernel output for one user over business_arrays()
     
-    # Extract user data with defaults
-    user_hours = user_data.get('weekly_hours', 1)
-    user_budget = user_data.get('investment_budget', 0)
-    user_schedule = user_data.get('work_schedule', 'flexible')
-    user_risk = user_data.get('risk_tolerance', 'moderate')
-    user_tech = user_data.get('tech_comfort', 'moderate')
-    user_background = user_data.get('background', '')
-    user_skills = user_data.get('skills', [])
-    user_task_pref = user_data.get('task_preference', 'mixed')
-    user_avoidances = user_data.get('avoidances', [])
-    willing_to_learn = user_data.get('willing_to_learn', 'possible')
+    Returns (float64[N, 6] components in scoring_kernel.COMPONENTS order, float64[N] weighted totals).
+    skill: skill_match per business; without it the totals are the deterministic floors.
+    """
+    user_arr = np.array([user.budget, user.hours, user.risk, user.tech, user.schedule_hit, user.schedule_miss],
+                        dtype=np.float64)
+    user_masks = np.array([user.schedule_mask, user.task_mask], dtype=np.int64)
+    if skill is None:
+        skill = np.zeros(arrays['min_cost'].shape[0])
     
-    # Extract business data
+    return scoring_kernel.score_all(user_arr, user_masks, arrays['min_cost'], arrays['max_cost'],
+                                    arrays['level_hours'], arrays['tech_lvl'], arrays['risk_lvl'],
+                                    arrays['ind_mask'], arrays['repeat_mask'], skill, _KERNEL_WEIGHTS)
+
+
+def deterministic_scores(user_data: Dict, business: Dict,
+                         avoid_mask: Optional[int] = None,
+                         numeric_scores: Optional[Dict[str, float]] = None) -> Optional[Dict[str, float]]:
+    """Every component except skill_match, in WEIGHTS order
+    
+    Returns None when the business conflicts with the user's avoidances.
+    avoid_mask: user_avoidance_mask() of the user's answers, shared across a request
+    """
     business_cost = business.get('startup_cost', '$0')
     business_profit = business.get('estimated_monthly_profit', '$0')
-    business_level = business.get('skill_level', 'Intermediate')
     business_industries = business.get('industry', []) if business.get('industry') else []
-    business_title = business.get('title', '')
-    business_description = business.get('description', '')
+    if '_cost_range' not in business:
+        precompute_business_fields(business)
     
     # Check avoidance criteria first (hard filter)
-    if not check_avoidance_criteria(user_avoidances, business_industries, business_title, business_description):
-        return {
-            'business_id': str(business.get('id')),
-            'business_title': business_title,
-            'total_score': 0.0,
-            'match_reason': 'Conflicts with user preferences',
-            'breakdown': {},
-            'estimated_profit': business_profit,
-            'startup_cost': business_cost,
-            'thumbnail_url': business.get('thumbnail_url'),
-            'video_link': business.get('video_link'),
-            'summary': business.get('summary')
-        }
+    if avoid_mask is None:
+        avoid_mask = user_avoidance_mask(user_data.get('avoidances', []))
+    if business['_avoid_mask'] & avoid_mask:
+        return None
     
-    # Calculate individual scores
-    scores = {
-        'startup_cost': score_startup_cost(user_budget, business_cost),
-        'time_commitment': score_time_commitment(user_hours, business_level),
-        'skill_match': score_skill_match_ai(user_background, user_skills, 
-                                           business_industries, business_title, 
-                                           business_description, willing_to_learn) if use_ai 
-                       else basic_skill_match(user_background, user_skills, business_title, business_industries),
-        'schedule_fit': score_schedule_fit(user_schedule, business_industries),
-        'risk_tolerance': score_risk_tolerance(user_risk, business_profit, business_cost),
-        'tech_comfort': score_tech_comfort(user_tech, business_industries, business_title),
-        'task_preference': score_task_preference(user_task_pref, business_industries, 
-                                                 business_description)
+    if numeric_scores is not None:
+        # Kernel output already has every deterministic component in WEIGHTS order
+        return numeric_scores
+    
+    cost_range = business['_cost_range']
+    profit_range = business['_profit_range']
+    return {
+        'startup_cost': score_startup_cost(user_data.get('investment_budget', 0), business_cost, cost_range),
+        'time_commitment': score_time_commitment(user_data.get('weekly_hours', 1),
+                                                 business.get('skill_level', 'Intermediate'),
+                                                 business['_level_hours']),
+        'schedule_fit': score_schedule_fit(user_data.get('work_schedule', 'flexible'), business_industries,
+                                           business['_ind_mask']),
+        'risk_tolerance': score_risk_tolerance(user_data.get('risk_tolerance', 'moderate'), business_profit,
+                                               business_cost, profit_range, cost_range),
+        'tech_comfort': score_tech_comfort(user_data.get('tech_comfort', 'moderate'), business_industries,
+                                           business.get('title', ''), business['_ind_mask']),
+        'task_preference': score_task_preference(user_data.get('task_preference', 'mixed'), business_industries,
+                                                 business.get('description', ''), business['_ind_mask'],
+                                                 business['_repeat_mask'])
     }
+
+
+def _weighted(sc: float, sh: float, sk: float, sf: float, sr: float, st: float, sp: float) -> float:
+    """Weighted total of the seven scores in WEIGHTS order, with the WEIGHTS values written out
     
+    Adds left to right like sum() over WEIGHTS, so totals are bit-identical. Keep in step with WEIGHTS.
+    """
+    return sc * 0.25 + sh * 0.20 + sk * 0.20 + sf * 0.10 + sr * 0.10 + st * 0.08 + sp * 0.07
+
+
+def total_score(partial_scores: Dict[str, float], skill_score: float) -> float:
+    """The rounded total_score calculate_business_score() reports for these scores"""
+    return round(_weighted(partial_scores['startup_cost'], partial_scores['time_commitment'], skill_score,
+                           partial_scores['schedule_fit'], partial_scores['risk_tolerance'],
+                           partial_scores['tech_comfort'], partial_scores['task_preference']), 3)
+
+
+def deterministic_floor(partial_scores: Dict[str, float]) -> float:
+    """Weighted total of the deterministic components, i.e. the score with skill_match = 0"""
+    return _weighted(partial_scores['startup_cost'], partial_scores['time_commitment'], 0.0,
+                     partial_scores['schedule_fit'], partial_scores['risk_tolerance'],
+                     partial_scores['tech_comfort'], partial_scores['task_preference'])
+
+
+def skill_score_can_matter(partial_scores: Dict[str, float], min_score: float, margin: float = 0.0005) -> bool:
+    """False when even a perfect skill match leaves the business under min_score
+    
+    The default margin covers rounding of the total.
+    """
+    return deterministic_floor(partial_scores) + WEIGHTS['skill_match'] >= min_score - margin
+
+
+def top_k_candidates(candidates: List[Tuple[Dict, Dict[str, float]]], limit: int,
+                     min_score: float) -> List[Tuple[Dict, Dict[str, float]]]:
+    """Drop (business, partial_scores) pairs that cannot make the top `limit`
+    
+    Every final total is at least its floor, so the limit-th best floor is a lower bound
+    on the limit-th best total; a business whose floor plus a perfect skill match stays
+    under it cannot be returned. The 0.001 margin keeps rounded ties in.
+    """
+    if limit <= 0:
+        return []
+    candidates = [c for c in candidates if skill_score_can_matter(c[1], min_score)]
+    if len(candidates) <= limit:
+        return candidates
+    
+    floors = [deterministic_floor(partial_scores) for _, partial_scores in candidates]
+    kth_floor = heapq.nlargest(limit, floors)[-1]
+    if kth_floor <= min_score:
+        return candidates
+    return [c for c in candidates if skill_score_can_matter(c[1], kth_floor, margin=0.001)]
+
+
+def calculate_business_score(user_data: Dict, business: Dict, use_ai: bool = True,
+                             avoid_mask: Optional[int] = None,
+                             numeric_scores: Optional[Dict[str, float]] = None,
+                             min_score: Optional[float] = None,
+                             skill_score: Optional[float] = None,
+                             partial_scores: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Calculate comprehensive score for a business
+    
+    avoid_mask: user_avoidance_mask() of the user's answers, shared across a request
+    numeric_scores: this business's entry from score_numeric_components()
+    min_score: skip the AI call when even a perfect skill match could not reach this total
+    skill_score: AI skill match already fetched for this business (see score_skill_matches)
+    partial_scores: deterministic_scores() already computed for this (non-avoided) business
+    """
+    
+    user_background = user_data.get('background', '')
+    user_skills = user_data.get('skills', [])
+    business_industries = business.get('industry', []) if business.get('industry') else []
+    business_title = business.get('title', '')
+    
+    if partial_scores is None:
+        partial_scores = deterministic_scores(user_data, business, avoid_mask, numeric_scores)
+    if partial_scores is None:
+        return _avoided_result(business)
+    
+    if skill_score is None:
+        if use_ai and (min_score is None or skill_score_can_matter(partial_scores, min_score)):
+            skill_score = score_skill_match_ai(user_background, user_skills, business_industries, business_title,
+                                               business.get('description', ''),
+                                               user_data.get('willing_to_learn', 'possible'))
+        else:
+            skill_score = basic_skill_match(user_background, user_skills, business_title, business_industries,
+                                            business)
+    
+    # Individual scores in WEIGHTS order
+    scores = {key: skill_score if key == 'skill_match' else partial_scores[key] for key in WEIGHTS}
+    return _score_result(business, scores)
+
+
+def _avoided_result(business: Dict) -> Dict[str, Any]:
+    return {
+        'business_id': str(business.get('id')),
+        'business_title': business.get('title', ''),
+        'total_score': 0.0,
+        'match_reason': 'Conflicts with user preferences',
+        'breakdown': {},
+        'estimated_profit': business.get('estimated_monthly_profit', '$0'),
+        'startup_cost': business.get('startup_cost', '$0'),
+        'thumbnail_url': business.get('thumbnail_url'),
+        'video_link': business.get('video_link'),
+        'summary': business.get('summary')
+    }
+
+
+def _score_result(business: Dict, scores: Dict[str, float]) -> Dict[str, Any]:
+    """Result entry for a business from its seven component scores (in WEIGHTS order)"""
     # Calculate weighted total
-    total_score = sum(scores[key] * WEIGHTS[key] for key in scores)
+    total = _weighted(scores['startup_cost'], scores['time_commitment'], scores['skill_match'],
+                      scores['schedule_fit'], scores['risk_tolerance'], scores['tech_comfort'],
+                      scores['task_preference'])
     
     # Generate match reason (top 3 factors)
     top_factors = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
@@ -437,18 +1080,322 @@ def calculate_business_score(user_data: Dict, business: Dict, use_ai: bool = Tru
     
     return {
         'business_id': str(business.get('id')),
-        'business_title': business_title,
-        'total_score': round(total_score, 3),
+        'business_title': business.get('title', ''),
+        'total_score': round(total, 3),
         'match_reason': match_reason,
         'breakdown': {k: round(v, 2) for k, v in scores.items()},
-        'estimated_profit': business_profit,
-        'startup_cost': business_cost,
+        'estimated_profit': business.get('estimated_monthly_profit', '$0'),
+        'startup_cost': business.get('startup_cost', '$0'),
         'thumbnail_url': business.get('thumbnail_url'),
         'video_link': business.get('video_link'),
         'summary': business.get('summary')
     }
 
 
+def score_catalogue(user_data: Dict, businesses: List[Dict],
+                    arrays: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """Total score of every business for one user, skill_match from basic_skill_match (no AI)
+    
+    The unrounded calculate_business_score(..., use_ai=False) totals as a float64[N] array,
+    0.0 for businesses the user's avoidances rule out.
+    arrays: business_arrays(businesses), e.g. the copy cached with the published blueprints
+    """
+    if not businesses:
+        return np.zeros(0)
+    if arrays is None:
+        arrays = business_arrays(businesses)
+    
+    background = user_data.get('background', '')
+    skills = user_data.get('skills', [])
+    skill = np.array(basic_skill_matches(background, skills, businesses), dtype=np.float64)
+    user = user_codes(user_data)
+    _, totals = score_arrays(user, arrays, skill)
+    
+    if user.avoid_mask:
+        totals[(arrays['avoid_mask'] & user.avoid_mask) != 0] = 0.0
+    return totals
+
+
+def score_businesses(user_data: Dict, businesses: List[Dict], min_score: float = 0.3, limit: int = 10,
+                     arrays: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+    """Top `limit` calculate_business_score(..., use_ai=False) results over min_score, best first
+    
+    Same results and order as scoring businesses one at a time, but the user's answers are
+    decoded once, the catalogue goes through the kernel in one call and only the returned
+    businesses get a breakdown and match reason. As in the request handler, skill matching
+    is skipped for businesses whose floor rules them out (see top_k_candidates).
+    """
+    if not businesses:
+        return []
+    if arrays is None:
+        arrays = business_arrays(businesses)
+    
+    user = user_codes(user_data)
+    components, floors = score_arrays(user, arrays)
+    avoided = (arrays['avoid_mask'] & user.avoid_mask) != 0
+    
+    # Same bounds and margins as skill_score_can_matter/top_k_candidates
+    best_case = floors + WEIGHTS['skill_match']
+    alive = ~avoided & (best_case >= min_score - 0.0005)
+    if np.count_nonzero(alive) > limit > 0:
+        kth_floor = np.partition(floors[alive], -limit)[-limit]
+        if kth_floor > min_score:
+            alive &= best_case >= kth_floor - 0.001
+    
+    alive_idx = np.flatnonzero(alive).tolist()
+    alive_skill = basic_skill_matches(user_data.get('background', ''), user_data.get('skills', []),
+                                      [businesses[i] for i in alive_idx])
+    skill = np.zeros(len(businesses))
+    skill[alive_idx] = alive_skill
+    _, totals = score_arrays(user, arrays, skill)
+    
+    # Rounded like the result's total_score, which is what min_score and the ranking compare
+    rounded = {}
+    if min_score <= 0:
+        rounded.update((i, 0.0) for i in np.flatnonzero(avoided).tolist())
+    rounded.update((i, round(total, 3)) for i, total in zip(alive_idx, totals[alive_idx].tolist()))
+    eligible = sorted(i for i, total in rounded.items() if total >= min_score)
+    # nlargest keeps sorted()'s order for ties
+    top = heapq.nlargest(limit, eligible, key=rounded.__getitem__)
+    
+    results = []
+    for i in top:
+        if avoided[i]:
+            results.append(_avoided_result(businesses[i]))
+            continue
+        scores = dict(zip(scoring_kernel.COMPONENTS, components[i].tolist()))
+        scores = {key: skill[i].item() if key == 'skill_match' else scores[key] for key in WEIGHTS}
+        results.append(_score_result(businesses[i], scores))
+    return results
+
+
+_worker_catalog = None
+
+
+def _init_score_worker(businesses: List[Dict], arrays: Dict[str, np.ndarray]):
+    global _worker_catalog
+    _worker_catalog = (businesses, arrays)
+    # One process per core already, so each kernel call stays on one thread
+    scoring_kernel.set_num_threads(1)
+
+
+def _score_users_chunk(users: List[Dict], min_score: float, limit: int) -> List[List[Dict[str, Any]]]:
+    businesses, arrays = _worker_catalog
+    return [score_businesses(user, businesses, min_score, limit, arrays) for user in users]
+
+
+def score_users(users: List[Dict], businesses: List[Dict], min_score: float = 0.3, limit: int = 10,
+                max_workers: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """score_businesses() for many users (evaluation runs, re-ranking everyone), one list per user
+    
+    Users are split into one chunk per worker process. The catalogue is preprocessed once
+    here and sent to each worker once, when it starts.
+    """
+    if not users:
+        return []
+    arrays = business_arrays(businesses)
+    workers = min(max_workers or os.cpu_count() or 1, len(users))
+    if workers == 1:
+        return [score_businesses(user, businesses, min_score, limit, arrays) for user in users]
+    
+    chunk_size = -(-len(users) // workers)
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+    # spawn, not fork: this process may already run the event loop and kernel threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_score_worker, initargs=(businesses, arrays)) as pool:
+        results = pool.map(_score_users_chunk, chunks, [min_score] * len(chunks), [limit] * len(chunks))
+        return [ranked for chunk in results for ranked in chunk]
+
+
+def recommendation_request_hash(user_data: Dict, limit: int, min_score: float, use_ai: bool) -> str:
+    """Stable hash of the quiz answers plus the options that change the result"""
+    payload = orjson.dumps({'quiz': user_data, 'limit': limit, 'min_score': min_score, 'use_ai': use_ai},
+                           default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+# Optional direct Postgres connection through Supabase's Supavisor transaction pooler
+# (postgres://...pooler.supabase.com:6543/postgres) for the hot reads and the cache upsert,
+# skipping PostgREST's JSON layer; PostgREST is used when it's unset or a query fails
+SUPAVISOR_URL = os.environ.get('SUPAVISOR_URL')
+
+_pg_pool = None
+_pg_pool_lock = None
+
+
+def direct_postgres_enabled() -> bool:
+    return asyncpg is not None and bool(SUPAVISOR_URL)
+
+
+async def _init_pg_connection(conn):
+    # Same value types PostgREST returns: jsonb as Python objects, uuid as str
+    await conn.set_type_codec('jsonb', schema='pg_catalog',
+                              encoder=lambda value: orjson.dumps(value).decode(), decoder=orjson.loads)
+    await conn.set_type_codec('uuid', schema='pg_catalog', encoder=str, decoder=str)
+
+
+async def _get_pg_pool():
+    """Shared asyncpg pool; like the AsyncOpenAI client, only use it on _get_async_loop()"""
+    global _pg_pool, _pg_pool_lock
+    if _pg_pool is None:
+        if _pg_pool_lock is None:
+            _pg_pool_lock = asyncio.Lock()
+        async with _pg_pool_lock:
+            if _pg_pool is None:
+                # The transaction pooler can't keep prepared statements between transactions
+                _pg_pool = await asyncpg.create_pool(SUPAVISOR_URL, min_size=1, max_size=5,
+                                                     statement_cache_size=0, init=_init_pg_connection)
+    return _pg_pool
+
+
+async def _pg_fetch(query: str, *args) -> List[Dict]:
+    pool = await _get_pg_pool()
+    return [dict(row) for row in await pool.fetch(query, *args)]
+
+
+async def _pg_execute(query: str, *args):
+    pool = await _get_pg_pool()
+    await pool.execute(query, *args)
+
+
+def pg_fetch(query: str, *args) -> List[Dict]:
+    """Rows of a query over the direct Postgres pool, as dicts"""
+    return run_on_async_loop(_pg_fetch(query, *args))
+
+
+def pg_execute(query: str, *args):
+    """Run a statement over the direct Postgres pool"""
+    run_on_async_loop(_pg_execute(query, *args))
+
+
+def get_user_rows(user_id: str) -> List[Dict]:
+    """The user's row ([] when not found) with its quiz_responses"""
+    if direct_postgres_enabled():
+        try:
+            return pg_fetch('SELECT quiz_responses FROM public.users WHERE id = $1', user_id)
+        except Exception as e:
+            print(f"Direct Postgres user read failed, using PostgREST: {e}")
+    return get_supabase().table('users').select('quiz_responses').eq('id', user_id).execute().data
+
+
+def get_blueprints_revision() -> str:
+    """Cheap fingerprint of the blueprints table: row count + latest updated_at"""
+    response = get_supabase().table('blueprints').select('updated_at', count='exact') \
+        .order('updated_at', desc=True).limit(1).execute()
+    latest = response.data[0]['updated_at'] if response.data else ''
+    return f"{getattr(response, 'count', None)}:{latest}"
+
+
+def get_cached_recommendations(user_id: str, quiz_hash: str, blueprints_rev: str) -> Optional[Dict]:
+    """Cached row for the user if it was computed from the same quiz answers and blueprints"""
+    try:
+        response = get_supabase().table('recommendations_cache') \
+            .select('recommendations, total_analyzed, user_quiz_hash, blueprints_rev') \
+            .eq('user_id', user_id).execute()
+    except Exception as cache_error:
+        print(f"Cache read error (non-critical): {cache_error}")
+        return None
+    
+    if not response.data:
+        return None
+    
+    cached = response.data[0]
+    if cached.get('user_quiz_hash') != quiz_hash or cached.get('blueprints_rev') != blueprints_rev:
+        return None
+    return cached
+
+
+# Cache writes happen after the response is built; drained on shutdown so queued rows aren't lost.
+# Created on the first write, so processes that only score (score_users' workers) never start it
+_CACHE_EXECUTOR = None
+_cache_executor_lock = threading.Lock()
+
+
+def _get_cache_executor() -> ThreadPoolExecutor:
+    global _CACHE_EXECUTOR
+    if _CACHE_EXECUTOR is None:
+        with _cache_executor_lock:
+            if _CACHE_EXECUTOR is None:
+                executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-upsert')
+                atexit.register(executor.shutdown)
+                _CACHE_EXECUTOR = executor
+    return _CACHE_EXECUTOR
+
+
+CACHE_UPSERT_SQL = """
+INSERT INTO public.recommendations_cache
+  (user_id, recommendations, total_analyzed, user_quiz_hash, blueprints_rev, updated_at)
+VALUES ($1, $2, $3, $4, $5, NOW())
+ON CONFLICT (user_id) DO UPDATE SET
+  recommendations = EXCLUDED.recommendations,
+  total_analyzed = EXCLUDED.total_analyzed,
+  user_quiz_hash = EXCLUDED.user_quiz_hash,
+  blueprints_rev = EXCLUDED.blueprints_rev,
+  updated_at = NOW()
+"""
+
+
+def _upsert_cached_recommendations(cache_data: Dict):
+    if direct_postgres_enabled():
+        try:
+            pg_execute(CACHE_UPSERT_SQL, cache_data['user_id'], cache_data['recommendations'],
+                       cache_data['total_analyzed'], cache_data['user_quiz_hash'], cache_data['blueprints_rev'])
+            return
+        except Exception as cache_error:
+            print(f"Direct Postgres cache write failed, using PostgREST: {cache_error}")
+    try:
+        get_supabase().table('recommendations_cache').upsert(cache_data, on_conflict='user_id').execute()
+    except Exception as cache_error:
+        print(f"Cache error (non-critical): {cache_error}")
+
+
+# Columns scoring and the response read; the parsed ranges are generated columns (setup_supabase.sql)
+BLUEPRINT_COLUMNS = ('id,title,industry,description,skill_level,startup_cost,estimated_monthly_profit,'
+                     'thumbnail_url,video_link,summary')
+BLUEPRINT_RANGE_COLUMNS = 'startup_cost_min,startup_cost_max,monthly_profit_min,monthly_profit_max'
+
+# Published blueprints kept between warm invocations, refetched when the revision moves
+BUSINESSES_TTL = 300  # seconds
+_businesses_cache = {'fetched_at': 0.0, 'rev': None, 'data': None}
+
+
+def select_published_blueprints(columns: str) -> List[Dict]:
+    """Published blueprint rows with the given comma-separated columns"""
+    if direct_postgres_enabled():
+        try:
+            return pg_fetch(f'SELECT {columns} FROM public.blueprints WHERE published = TRUE')
+        except asyncpg.UndefinedColumnError:
+            # Let the caller drop the missing columns instead of asking PostgREST for them too
+            raise
+        except Exception as e:
+            print(f"Direct Postgres blueprints read failed, using PostgREST: {e}")
+    return get_supabase().table('blueprints').select(columns).eq('published', True).execute().data
+
+
+def load_published_businesses(blueprints_rev: Optional[str]) -> Tuple[List[Dict], Dict[str, np.ndarray]]:
+    """Published blueprints, preprocessed, and their business_arrays(), reused while blueprints_rev is unchanged
+    
+    Entries also expire after BUSINESSES_TTL; with no revision (lookup failed) only the TTL applies.
+    """
+    cache = _businesses_cache
+    now = time.monotonic()
+    if (cache['data'] is not None and now - cache['fetched_at'] < BUSINESSES_TTL
+            and (blueprints_rev is None or blueprints_rev == cache['rev'])):
+        return cache['data']
+    
+    try:
+        businesses = select_published_blueprints(f'{BLUEPRINT_COLUMNS},{BLUEPRINT_RANGE_COLUMNS}')
+    except Exception as e:
+        # Generated range columns not installed yet, parse the strings instead
+        print(f"Range columns unavailable, parsing cost strings: {e}")
+        businesses = select_published_blueprints(BLUEPRINT_COLUMNS)
+    for business in businesses:
+        precompute_business_fields(business)
+    catalog = (businesses, business_arrays(businesses))
+    _businesses_cache.update(fetched_at=now, rev=blueprints_rev, data=catalog)
+    return catalog
+
+
 @functions_framework.http
 def recommend_businesses(request):
     """Cloud Function entry point - works with Supabase"""
@@ -463,14 +1410,17 @@ def recommend_businesses(request):
         }
         return ('', 204, headers)
     
-    headers = {'Access-Control-Allow-Origin': '*'}
+    headers = {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'}
     
     try:
         # Parse request
-        request_json = request.get_json(silent=True)
+        try:
+            request_json = orjson.loads(request.get_data())
+        except orjson.JSONDecodeError:
+            request_json = None
         
         if not request_json or 'user_id' not in request_json:
-            return (json.dumps({'error': 'user_id required'}), 400, headers)
+            return (orjson.dumps({'error': 'user_id required'}), 400, headers)
         
         user_id = request_json['user_id']
         limit = request_json.get('limit', 10)
@@ -478,47 +1428,99 @@ def recommend_businesses(request):
         use_ai = request_json.get('use_ai', True)
         
         # Get user quiz data from Supabase
-        user_response = supabase.table('users').select('quiz_responses').eq('id', user_id).execute()
+        user_rows = get_user_rows(user_id)
         
-        if not user_response.data or len(user_response.data) == 0:
-            return (json.dumps({'error': 'User not found'}), 404, headers)
+        if not user_rows:
+            return (orjson.dumps({'error': 'User not found'}), 404, headers)
         
-        user_data = user_response.data[0].get('quiz_responses', {})
+        user_data = user_rows[0].get('quiz_responses', {})
         
-        # Get all published businesses from Supabase
-        businesses_response = supabase.table('blueprints').select('*').eq('published', True).execute()
+        # Serve the cached result when neither the quiz nor the blueprints changed
+        quiz_hash = recommendation_request_hash(user_data, limit, min_score, use_ai)
+        try:
+            blueprints_rev = get_blueprints_revision()
+        except Exception as rev_error:
+            print(f"Blueprints revision error (non-critical): {rev_error}")
+            blueprints_rev = None
+        
+        cached = get_cached_recommendations(user_id, quiz_hash, blueprints_rev) if blueprints_rev else None
+        if cached:
+            return (orjson.dumps({
+                'success': True,
+                'user_id': user_id,
+                'recommendations': cached['recommendations'],
+                'total_analyzed': cached.get('total_analyzed'),
+                'total_matches': len(cached['recommendations']),
+                'cached': True
+            }), 200, headers)
         
-        if not businesses_response.data:
-            return (json.dumps({'error': 'No businesses found'}), 404, headers)
+        # Get all published businesses (cached per warm instance)
+        businesses, business_columns = load_published_businesses(blueprints_rev)
         
-        businesses = businesses_response.data
+        if not businesses:
+            return (orjson.dumps({'error': 'No businesses found'}), 404, headers)
         
         # Score all businesses
-        scored_businesses = []
-        for business in businesses:
-            score_data = calculate_business_score(user_data, business, use_ai=use_ai)
-            if score_data['total_score'] >= min_score:
-                scored_businesses.append(score_data)
+        avoid_mask = user_avoidance_mask(user_data.get('avoidances', []))
+        numeric_scores = score_numeric_components(user_data, businesses, business_columns)
+        
+        # Pass 1: cheap components for everything; drop avoided businesses and any that can't
+        # reach min_score or the top `limit` even with a perfect skill match
+        candidates = []
+        avoided = []
+        for business, numeric in zip(businesses, numeric_scores):
+            partial_scores = deterministic_scores(user_data, business, avoid_mask, numeric)
+            if partial_scores is not None:
+                candidates.append((business, partial_scores))
+            elif min_score <= 0:
+                avoided.append(business)
+        candidates = top_k_candidates(candidates, limit, min_score)
         
-        # Sort by score and limit
-        scored_businesses.sort(key=lambda x: x['total_score'], reverse=True)
-        recommendations = scored_businesses[:limit]
+        # Pass 2: AI skill match for the survivors only, in one concurrent pass
+        if use_ai:
+            skill_scores = score_skill_matches(user_data, [business for business, _ in candidates])
+        else:
+            skill_scores = basic_skill_matches(user_data.get('background', ''), user_data.get('skills', []),
+                                               [business for business, _ in candidates])
+        
+        # Rank on the rounded totals alone; only the returned businesses get a breakdown and reason
+        ranked = [(total_score(partial_scores, skill_score), i)
+                  for i, ((_, partial_scores), skill_score) in enumerate(zip(candidates, skill_scores))]
+        # Avoided businesses score 0.0 and only qualify when min_score allows it
+        ranked += [(0.0, len(candidates) + i) for i in range(len(avoided))]
+        ranked = [entry for entry in ranked if entry[0] >= min_score]
+        
+        # Top `limit` by score; nlargest keeps sorted()'s order for ties
+        by_total = itemgetter(0)
+        if len(ranked) <= limit:
+            top = sorted(ranked, key=by_total, reverse=True)
+        else:
+            top = heapq.nlargest(limit, ranked, key=by_total)
+        
+        recommendations = []
+        for _, i in top:
+            if i >= len(candidates):
+                recommendations.append(_avoided_result(avoided[i - len(candidates)]))
+                continue
+            business, partial_scores = candidates[i]
+            recommendations.append(calculate_business_score(user_data, business, use_ai=use_ai,
+                                                            partial_scores=partial_scores,
+                                                            skill_score=skill_scores[i]))
         
         # Cache results in Supabase
         cache_data = {
             'user_id': user_id,
             'recommendations': recommendations,
             'total_analyzed': len(businesses),
+            'user_quiz_hash': quiz_hash,
+            'blueprints_rev': blueprints_rev,
             'updated_at': 'now()'
         }
         
-        # Upsert to cache table
-        try:
-            supabase.table('recommendations_cache').upsert(cache_data, on_conflict='user_id').execute()
-        except Exception as cache_error:
-            print(f"Cache error (non-critical): {cache_error}")
+        # Upsert to cache table without holding up the response
+        _get_cache_executor().submit(_upsert_cached_recommendations, cache_data)
         
-        return (json.dumps({
+        return (orjson.dumps({
             'success': True,
             'user_id': user_id,
             'recommendations': recommendations,
@@ -530,7 +1532,7 @@ def recommend_businesses(request):
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
-        return (json.dumps({'error': str(e)}), 500, headers)
+        return (orjson.dumps({'error': str(e)}), 500, headers)
 
 
 # For local testing
@@ -560,4 +1562,4 @@ if __name__ == '__main__':
     }
     
     result = calculate_business_score(sample_user, sample_business, use_ai=False)
-    print(json.dumps(result, indent=2))
\ No newline at end of file
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Numeric scoring kernel for the recommendation engine
+Scores startup cost, time commitment, schedule fit, risk tolerance, tech comfort and
+task preference for a whole catalog in one compiled loop (Numba, parallel over businesses)
+The inputs are column arrays built once per blueprint load, see business_arrays()
+Without Numba, uses the Cython build of the same loop (scoring_kernel_c.pyx) if it
+was compiled, and otherwise runs the loop in plain Python
+"""
+
+import multiprocessing
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Column order of the components matrix returned by score_all
+COMPONENTS = ('startup_cost', 'time_commitment', 'schedule_fit', 'risk_tolerance', 'tech_comfort',
+              'task_preference')
+
+# Order of the weights score_all takes: COMPONENTS plus the skill match, as in the engine's WEIGHTS
+WEIGHTED = ('startup_cost', 'time_commitment', 'skill_match', 'schedule_fit', 'risk_tolerance',
+            'tech_comfort', 'task_preference')
+
+# user_arr layout: [budget, weekly hours, risk level, tech level,
+#                   schedule score with a matching industry, schedule score without]
+USER_BUDGET, USER_HOURS, USER_RISK, USER_TECH, USER_SCHEDULE_HIT, USER_SCHEDULE_MISS = range(6)
+
+# user_masks layout: [schedule industries, preferred task industries (0 = no preference)]
+MASK_SCHEDULE, MASK_TASK = range(2)
+
+# Business levels that mean "not enough data", scored neutrally like the scalar functions
+UNKNOWN_LEVEL = -1
+
+# ind_mask of a business with no industries listed
+NO_INDUSTRIES = -1
+
+
+# No reassociation or FMA contraction, so totals match the scalar weighted sum bit for bit
+@njit(cache=True, parallel=True, fastmath={'nnan', 'ninf', 'nsz'})
+def score_all(user_arr, user_masks, min_cost, max_cost, level_hours, tech_lvl, risk_lvl, ind_mask, repeat_mask,
+              skill, weights):
+    """Score N businesses at once
+
+    user_arr: float64[6], see USER_* indices
+    user_masks: int64[2] industry bitmasks, see MASK_* indices
+    min_cost, max_cost, level_hours: float64[N]
+    tech_lvl, risk_lvl: int64[N] (UNKNOWN_LEVEL when the scalar scorers would return a neutral score)
+    ind_mask: int64[N] industry bitmasks (NO_INDUSTRIES when the list is empty)
+    repeat_mask: int64[N] bits of the industries listed more than once
+    skill: float64[N] skill match scores (zeros give the deterministic floor)
+    weights: float64[7] in WEIGHTED order
+
+    Returns (components float64[N, 6], weighted totals float64[N])
+    """
+    n = min_cost.shape[0]
+    components = np.empty((n, 6))
+    weighted = np.empty(n)
+    budget = user_arr[USER_BUDGET]
+    hours = user_arr[USER_HOURS]
+    user_risk = user_arr[USER_RISK]
+    user_tech = user_arr[USER_TECH]
+    schedule_hit = user_arr[USER_SCHEDULE_HIT]
+    schedule_miss = user_arr[USER_SCHEDULE_MISS]
+    schedule_mask = user_masks[MASK_SCHEDULE]
+    task_mask = user_masks[MASK_TASK]
+
+    for i in prange(n):
+        # Startup cost
+        if min_cost[i] == 0 and max_cost[i] == 0:
+            s_cost = 0.8
+        elif budget >= (min_cost[i] + max_cost[i]) / 2:
+            s_cost = 1.0
+        elif budget >= min_cost[i]:
+            s_cost = 0.7
+        elif budget >= min_cost[i] * 0.5:
+            s_cost = 0.4
+        else:
+            s_cost = 0.1
+
+        # Time commitment
+        required = level_hours[i]
+        if hours >= required * 1.5:
+            s_time = 1.0
+        elif hours >= required:
+            s_time = 0.9
+        elif hours >= required * 0.7:
+            s_time = 0.6
+        else:
+            s_time = 0.3
+
+        # Schedule fit and task preference
+        industries = ind_mask[i]
+        if industries == NO_INDUSTRIES:
+            s_schedule = 0.7
+            s_task = 0.7
+        else:
+            s_schedule = schedule_hit if industries & schedule_mask else schedule_miss
+            if task_mask == 0:
+                s_task = 0.8
+            else:
+                # Every listed entry counts, so a repeated preferred industry is two matches
+                matched = industries & task_mask
+                if matched == 0:
+                    s_task = 0.4
+                elif matched & (matched - 1) == 0 and repeat_mask[i] & task_mask == 0:
+                    # Exactly one bit set, listed once
+                    s_task = 0.7
+                else:
+                    s_task = 1.0
+
+        # Risk tolerance
+        if risk_lvl[i] == UNKNOWN_LEVEL:
+            s_risk = 0.6
+        else:
+            diff = abs(user_risk - risk_lvl[i])
+            if diff == 0:
+                s_risk = 1.0
+            elif diff == 1:
+                s_risk = 0.7
+            elif diff == 2:
+                s_risk = 0.4
+            else:
+                s_risk = 0.2
+
+        # Tech comfort
+        if tech_lvl[i] == UNKNOWN_LEVEL:
+            s_tech = 0.7
+        else:
+            diff = abs(user_tech - tech_lvl[i])
+            if diff == 0:
+                s_tech = 1.0
+            elif diff == 1:
+                s_tech = 0.7
+            elif diff == 2:
+                s_tech = 0.4
+            else:
+                s_tech = 0.1
+
+        components[i, 0] = s_cost
+        components[i, 1] = s_time
+        components[i, 2] = s_schedule
+        components[i, 3] = s_risk
+        components[i, 4] = s_tech
+        components[i, 5] = s_task
+        weighted[i] = (s_cost * weights[0] + s_time * weights[1] + skill[i] * weights[2]
+                       + s_schedule * weights[3] + s_risk * weights[4] + s_tech * weights[5]
+                       + s_task * weights[6])
+
+    return components, weighted
+
+
+def set_num_threads(n):
+    """Cap the threads score_all's parallel loop uses (no-op without Numba)"""
+    if _NUMBA_AVAILABLE:
+        numba.set_num_threads(n)
+
+
+def _warm_up():
+    """Compile (or load the cached build of) score_all at import time"""
+    one = np.ones(1)
+    level = np.zeros(1, dtype=np.int64)
+    score_all(np.zeros(6), np.zeros(2, dtype=np.int64), one, one, one, level, level, level, level, one, np.ones(7))
+
+
+if _NUMBA_AVAILABLE:
+    # Spawned scoring workers skip this and load the cached build on their first call
+    if multiprocessing.parent_process() is None:
+        _warm_up()
+else:
+    try:
+        from scoring_kernel_c import score_all  # noqa: F811
+    except ImportError:
+        pass
@@ -0,0 +1,122 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+"""
+Cython build of scoring_kernel.score_all for deployments without Numba
+Same arguments, results and loop as the Numba kernel; scoring_kernel imports it when numba is missing
+Build next to the sources with: cythonize -i scoring_kernel_c.pyx
+(add -fopenmp to CFLAGS and LDFLAGS to run the prange loop on every core)
+"""
+
+import numpy as np
+from cython.parallel import prange
+from libc.math cimport fabs
+from libc.stdint cimport int64_t
+
+# Keep in sync with scoring_kernel
+cdef int64_t UNKNOWN_LEVEL = -1
+cdef int64_t NO_INDUSTRIES = -1
+
+
+cdef inline double _startup_cost(double budget, double min_cost, double max_cost) noexcept nogil:
+    if min_cost == 0 and max_cost == 0:
+        return 0.8
+    elif budget >= (min_cost + max_cost) / 2:
+        return 1.0
+    elif budget >= min_cost:
+        return 0.7
+    elif budget >= min_cost * 0.5:
+        return 0.4
+    return 0.1
+
+
+cdef inline double _time_commitment(double hours, double required) noexcept nogil:
+    if hours >= required * 1.5:
+        return 1.0
+    elif hours >= required:
+        return 0.9
+    elif hours >= required * 0.7:
+        return 0.6
+    return 0.3
+
+
+cdef inline double _task_preference(int64_t industries, int64_t repeated, int64_t task_mask) noexcept nogil:
+    cdef int64_t matched
+    if task_mask == 0:
+        return 0.8
+    # Every listed entry counts, so a repeated preferred industry is two matches
+    matched = industries & task_mask
+    if matched == 0:
+        return 0.4
+    elif matched & (matched - 1) == 0 and repeated & task_mask == 0:
+        # Exactly one bit set, listed once
+        return 0.7
+    return 1.0
+
+
+cdef inline double _level_diff(double user_level, int64_t level, double unknown,
+                               double d0, double d1, double d2, double d3) noexcept nogil:
+    cdef double diff
+    if level == UNKNOWN_LEVEL:
+        return unknown
+    diff = fabs(user_level - level)
+    if diff == 0:
+        return d0
+    elif diff == 1:
+        return d1
+    elif diff == 2:
+        return d2
+    return d3
+
+
+def score_all(const double[::1] user_arr, const int64_t[::1] user_masks,
+              const double[::1] min_cost, const double[::1] max_cost, const double[::1] level_hours,
+              const int64_t[::1] tech_lvl, const int64_t[::1] risk_lvl, const int64_t[::1] ind_mask,
+              const int64_t[::1] repeat_mask, const double[::1] skill, const double[::1] weights):
+    """Score N businesses at once, see scoring_kernel.score_all for the layouts
+
+    Returns (components float64[N, 6], weighted totals float64[N])
+    """
+    cdef Py_ssize_t n = min_cost.shape[0]
+    cdef Py_ssize_t i
+    components_arr = np.empty((n, 6))
+    weighted_arr = np.empty(n)
+    cdef double[:, ::1] components = components_arr
+    cdef double[::1] weighted = weighted_arr
+
+    cdef double budget = user_arr[0]
+    cdef double hours = user_arr[1]
+    cdef double user_risk = user_arr[2]
+    cdef double user_tech = user_arr[3]
+    cdef double schedule_hit = user_arr[4]
+    cdef double schedule_miss = user_arr[5]
+    cdef int64_t schedule_mask = user_masks[0]
+    cdef int64_t task_mask = user_masks[1]
+
+    cdef double s_cost, s_time, s_schedule, s_risk, s_tech, s_task
+    cdef int64_t industries
+
+    for i in prange(n, nogil=True):
+        s_cost = _startup_cost(budget, min_cost[i], max_cost[i])
+        s_time = _time_commitment(hours, level_hours[i])
+
+        industries = ind_mask[i]
+        if industries == NO_INDUSTRIES:
+            s_schedule = 0.7
+            s_task = 0.7
+        else:
+            s_schedule = schedule_hit if industries & schedule_mask else schedule_miss
+            s_task = _task_preference(industries, repeat_mask[i], task_mask)
+
+        s_risk = _level_diff(user_risk, risk_lvl[i], 0.6, 1.0, 0.7, 0.4, 0.2)
+        s_tech = _level_diff(user_tech, tech_lvl[i], 0.7, 1.0, 0.7, 0.4, 0.1)
+
+        components[i, 0] = s_cost
+        components[i, 1] = s_time
+        components[i, 2] = s_schedule
+        components[i, 3] = s_risk
+        components[i, 4] = s_tech
+        components[i, 5] = s_task
+        weighted[i] = (s_cost * weights[0] + s_time * weights[1] + skill[i] * weights[2]
+                       + s_schedule * weights[3] + s_risk * weights[4] + s_tech * weights[5]
+                       + s_task * weights[6])
+
+    return components_arr, weighted_arr
@@ -33,11 +33,125 @@ CREATE TABLE IF NOT EXISTS public.recommendations_cache (
   CONSTRAINT unique_user_cache UNIQUE (user_id)
 );
 
+-- Cache validation: hash of quiz answers + request options, and the blueprints revision
+ALTER TABLE public.recommendations_cache ADD COLUMN IF NOT EXISTS user_quiz_hash TEXT;
+ALTER TABLE public.recommendations_cache ADD COLUMN IF NOT EXISTS blueprints_rev TEXT;
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_users_quiz_responses ON public.users USING GIN (quiz_responses);
 CREATE INDEX IF NOT EXISTS idx_recommendations_cache_user_id ON public.recommendations_cache (user_id);
 CREATE INDEX IF NOT EXISTS idx_recommendations_cache_updated_at ON public.recommendations_cache (updated_at);
 
+-- Enable pgvector and store one skill embedding per blueprint
+-- (backfill with: python backfill_embeddings.py)
+CREATE EXTENSION IF NOT EXISTS vector;
+ALTER TABLE public.blueprints ADD COLUMN IF NOT EXISTS skill_embedding vector(1536);
+
+-- Cosine similarity against the stored embeddings, so the API receives one number
+-- per blueprint instead of the 1536-float vectors
+CREATE OR REPLACE FUNCTION public.skill_similarities(query_embedding vector(1536), business_ids TEXT[])
+RETURNS TABLE (id TEXT, similarity DOUBLE PRECISION)
+LANGUAGE sql STABLE
+AS $$
+  SELECT b.id::TEXT, 1 - (b.skill_embedding <=> query_embedding)
+  FROM public.blueprints b
+  WHERE b.id::TEXT = ANY (business_ids) AND b.skill_embedding IS NOT NULL;
+$$;
+
+-- Batched write for backfill_embeddings.py: [{"id": ..., "skill_embedding": [...]}, ...]
+CREATE OR REPLACE FUNCTION public.set_skill_embeddings(embeddings JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+  WITH updated AS (
+    UPDATE public.blueprints b
+    SET skill_embedding = (e->>'skill_embedding')::vector
+    FROM jsonb_array_elements(embeddings) e
+    WHERE b.id::TEXT = e->>'id'
+    RETURNING 1
+  )
+  SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- Parse plain cost strings like '$1,000–$3,000', '$200 to $500' or '$500'.
+-- Anything else ('Varies', signed or over 9-digit values) is NULL and left to
+-- parse_cost_range in Python, so a stored bound always equals what Python parses
+CREATE OR REPLACE FUNCTION public.parse_cost_bound(cost TEXT, want_max BOOLEAN)
+RETURNS INTEGER AS $$
+DECLARE
+  cleaned TEXT := btrim(replace(replace(coalesce(cost, ''), '$', ''), ',', ''));
+  parts TEXT[];
+BEGIN
+  parts := regexp_match(cleaned, '^([0-9]{1,9}) *(?:–|-|to) *([0-9]{1,9})$');
+  IF parts IS NOT NULL THEN
+    RETURN CASE WHEN want_max THEN parts[2]::INTEGER ELSE parts[1]::INTEGER END;
+  END IF;
+  IF cleaned ~ '^[0-9]{1,9}$' THEN
+    RETURN cleaned::INTEGER;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Parsed cost/profit ranges, kept in sync by Postgres on every insert/update
+-- so the scoring code only parses the strings parse_cost_bound() leaves NULL
+ALTER TABLE public.blueprints
+  ADD COLUMN IF NOT EXISTS startup_cost_min INTEGER GENERATED ALWAYS AS (public.parse_cost_bound(startup_cost, false)) STORED,
+  ADD COLUMN IF NOT EXISTS startup_cost_max INTEGER GENERATED ALWAYS AS (public.parse_cost_bound(startup_cost, true)) STORED,
+  ADD COLUMN IF NOT EXISTS monthly_profit_min INTEGER GENERATED ALWAYS AS (public.parse_cost_bound(estimated_monthly_profit, false)) STORED,
+  ADD COLUMN IF NOT EXISTS monthly_profit_max INTEGER GENERATED ALWAYS AS (public.parse_cost_bound(estimated_monthly_profit, true)) STORED;
+
+-- Candidate blueprints for /api/recommend: drops rows that cannot reach min_score
+-- even with a perfect skill match, and rows in an avoided industry (industry is TEXT[])
+CREATE OR REPLACE FUNCTION public.recommend_candidates(
+  user_budget NUMERIC,
+  user_hours INTEGER,
+  min_score REAL DEFAULT 0.3,
+  avoid_industries TEXT[] DEFAULT '{}'
+)
+RETURNS TABLE (
+  id public.blueprints.id%TYPE,
+  title public.blueprints.title%TYPE,
+  industry public.blueprints.industry%TYPE,
+  description public.blueprints.description%TYPE,
+  skill_level public.blueprints.skill_level%TYPE,
+  startup_cost public.blueprints.startup_cost%TYPE,
+  estimated_monthly_profit public.blueprints.estimated_monthly_profit%TYPE,
+  startup_cost_min INTEGER,
+  startup_cost_max INTEGER
+) AS $$
+  SELECT b.id, b.title, b.industry, b.description, b.skill_level, b.startup_cost,
+         b.estimated_monthly_profit, b.startup_cost_min, b.startup_cost_max
+  FROM public.blueprints b
+  CROSS JOIN LATERAL (
+    SELECT
+      CASE
+        -- Not parsed in SQL: assume the best cost score and let Python score it
+        WHEN b.startup_cost_min IS NULL OR b.startup_cost_max IS NULL THEN 1.0
+        WHEN b.startup_cost_min = 0 AND b.startup_cost_max = 0 THEN 0.8
+        WHEN user_budget >= (b.startup_cost_min + b.startup_cost_max) / 2.0 THEN 1.0
+        WHEN user_budget >= b.startup_cost_min THEN 0.7
+        WHEN user_budget >= b.startup_cost_min * 0.5 THEN 0.4
+        ELSE 0.1
+      END AS s_cost,
+      CASE coalesce(b.skill_level, 'Intermediate')
+        WHEN 'Beginner' THEN 10 WHEN 'Advanced' THEN 20 ELSE 15
+      END AS required_hours
+  ) c
+  CROSS JOIN LATERAL (
+    SELECT CASE
+      WHEN user_hours >= c.required_hours * 1.5 THEN 1.0
+      WHEN user_hours >= c.required_hours THEN 0.9
+      WHEN user_hours >= c.required_hours * 0.7 THEN 0.6
+      ELSE 0.3
+    END AS s_time
+  ) t
+  WHERE b.published = TRUE
+    AND NOT (coalesce(b.industry, '{}') && avoid_industries)
+    -- Same weights as the Vercel handler; 0.2 is the best possible skill contribution
+    AND c.s_cost * 0.25 + t.s_time * 0.2 + 0.2 + 0.35 >= min_score - 0.0005;
+$$ LANGUAGE sql STABLE;
+
 -- Create function to auto-update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -54,6 +168,16 @@ CREATE TRIGGER update_users_updated_at
   FOR EACH ROW
   EXECUTE FUNCTION update_updated_at_column();
 
+-- Track blueprint edits so cached recommendations can be invalidated
+ALTER TABLE public.blueprints ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS idx_blueprints_updated_at ON public.blueprints (updated_at);
+
+DROP TRIGGER IF EXISTS update_blueprints_updated_at ON public.blueprints;
+CREATE TRIGGER update_blueprints_updated_at
+  BEFORE UPDATE ON public.blueprints
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at_column();
+
 -- Create trigger for recommendations_cache table
 DROP TRIGGER IF EXISTS update_cache_updated_at ON public.recommendations_cache;
 CREATE TRIGGER update_cache_updated_at
@@ -86,6 +210,10 @@ GRANT SELECT, INSERT, UPDATE ON public.recommendations_cache TO authenticated, a
 -- Tables created:
 -- 1. users (with quiz_responses JSONB column)
 -- 2. recommendations_cache (for caching scored results)
+-- 3. blueprints.skill_embedding (pgvector column for skill matching)
+--    with skill_similarities() and set_skill_embeddings()
+-- 4. blueprints.startup_cost_min/max, monthly_profit_min/max (parsed ranges)
+-- 5. recommend_candidates() RPC
 --
 -- Next steps:
 -- 1. Update deploy.sh with your Supabase credentials
@@ -0,0 +1,385 @@
+"""
+Tests for the Vercel API (api/index.py)
+Supabase and OpenAI are replaced with small in-memory fakes
+"""
+
+import json
+import types
+
+import pytest
+
+import backfill_embeddings
+from api import index as api
+
+
+USER = {
+    'weekly_hours': 2,
+    'investment_budget': 1500,
+    'background': 'Software developer',
+    'skills': ['web_development', 'programming'],
+    'willing_to_learn': 'yes',
+}
+
+BLUEPRINTS = [
+    {'id': 'b1', 'title': 'AI T-Shirt Store', 'industry': ['E-Commerce', 'Technology'],
+     'description': 'Design shirts with AI tools', 'skill_level': 'Beginner',
+     'startup_cost': '$100–$500', 'estimated_monthly_profit': '$1,000–$10,000', 'published': True,
+     'thumbnail_url': 't1.png', 'video_link': 'v1', 'summary': 'Shirts'},
+    {'id': 'b2', 'title': 'Farmers Market Stand', 'industry': ['Retail', 'Food & Beverage'],
+     'description': 'Sell homemade goods', 'skill_level': 'Beginner',
+     'startup_cost': '$50–$200', 'estimated_monthly_profit': '$500–$2,000', 'published': True},
+    {'id': 'b3', 'title': 'Strategy Consulting', 'industry': ['Consulting'],
+     'description': 'High-end consulting', 'skill_level': 'Advanced',
+     'startup_cost': '$20,000–$50,000', 'estimated_monthly_profit': '$5,000–$20,000', 'published': True},
+]
+
+
+class FakeQuery:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.filters = []
+
+    def select(self, columns='*'):
+        self.columns = None if columns == '*' else columns.replace(' ', '').split(',')
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def execute(self):
+        self.db.queries.append((self.name, self.columns))
+        rows = [dict(r) for r in self.db.tables.get(self.name, []) if all(f(r) for f in self.filters)]
+        if self.columns:
+            rows = [{c: r.get(c) for c in self.columns} for r in rows]
+        return types.SimpleNamespace(data=rows[:getattr(self, 'row_limit', None)])
+
+
+class FakeSupabase:
+    def __init__(self, blueprints=BLUEPRINTS, user=USER):
+        self.tables = {'users': [{'id': 'u1', 'quiz_responses': user}],
+                       'blueprints': [dict(b) for b in blueprints]}
+        self.queries = []
+        self.rpcs = {}
+        self.rpc_calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        handler = self.rpcs.get(name)
+        if handler is None:
+            raise RuntimeError(f'function {name} does not exist')
+        return types.SimpleNamespace(execute=lambda: types.SimpleNamespace(data=handler(params)))
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, model, input):
+        self.calls.append(input)
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=[0.1, 0.2]) for _ in input])
+
+
+class FakeChat:
+    """Answers every chat completion with the same content"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        message = types.SimpleNamespace(content=self.content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(api, 'get_supabase', lambda: fake)
+    monkeypatch.setattr(api, '_BLUEPRINTS_CACHE', {})
+    return fake
+
+
+def use_chat(monkeypatch, fake, embeddings=None):
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=fake), embeddings=embeddings)
+    monkeypatch.setattr(api, 'get_openai', lambda: client)
+    return fake
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    return use_chat(monkeypatch, FakeChat(json.dumps([{'i': 0, 's': 0.9}, {'i': 1, 's': 1.7}])))
+
+
+def recommend(**body):
+    response = api.app.test_client().post('/api/recommend', json={'user_id': 'u1', **body})
+    return response.status_code, response.get_json()
+
+
+def test_skill_match_uses_one_call_for_the_whole_catalogue(sb, chat):
+    status, body = recommend(min_score=0.0)
+    assert status == 200
+    assert len(chat.calls) == 1
+    skill = {r['business_id']: r['breakdown']['skill_match'] for r in body['recommendations']}
+    # clamped to 1.0, and b3 (skipped by the model) keeps the 0.5 fallback
+    assert skill == {'b1': 0.9, 'b2': 1.0, 'b3': 0.5}
+
+
+def test_duplicate_blueprints_are_rated_once(monkeypatch):
+    chat = use_chat(monkeypatch, FakeChat(json.dumps([{'i': 0, 's': 0.7}, {'i': 1, 's': 0.2}])))
+    copy = dict(BLUEPRINTS[0], id='b1-copy')
+    scores = api.score_skill_match_ai_batch(USER, [BLUEPRINTS[0], BLUEPRINTS[1], copy])
+    assert scores == {'b1': 0.7, 'b1-copy': 0.7, 'b2': 0.2}
+    prompt = chat.calls[0]['messages'][0]['content']
+    assert prompt.count('AI T-Shirt Store') == 1
+    assert chat.calls[0]['max_tokens'] == 16 * 2 + 16
+
+
+def test_skill_match_falls_back_when_the_reply_is_not_json(sb, monkeypatch):
+    use_chat(monkeypatch, FakeChat('sorry, I cannot help with that'))
+    status, body = recommend(min_score=0.0)
+    assert status == 200
+    assert {r['breakdown']['skill_match'] for r in body['recommendations']} == {0.5}
+
+
+def test_recommend_without_ai_makes_no_openai_call(sb, chat):
+    status, body = recommend(use_ai=False, min_score=0.0)
+    assert status == 200
+    assert chat.calls == []
+    # b1 and b2 tie on score and keep catalogue order
+    assert [r['business_id'] for r in body['recommendations']] == ['b1', 'b2', 'b3']
+
+
+def stored_similarities(similarities):
+    """skill_similarities RPC for blueprints with a stored embedding"""
+    return lambda params: [{'id': i, 'similarity': similarities[i]}
+                           for i in params['business_ids'] if i in similarities]
+
+
+def test_embedded_blueprints_skip_the_chat_prompt(sb, monkeypatch):
+    chat = use_chat(monkeypatch, FakeChat(json.dumps([{'i': 0, 's': 0.4}])), FakeEmbeddings())
+    sb.rpcs['skill_similarities'] = stored_similarities({'b1': 0.83, 'b2': 1.2})
+    monkeypatch.setattr(api, 'SIMILARITY_BATCH', 2)
+    status, body = recommend(min_score=0.0)
+    assert status == 200
+    skill = {r['business_id']: r['breakdown']['skill_match'] for r in body['recommendations']}
+    assert skill == {'b1': 0.83, 'b2': 1.0, 'b3': 0.4}
+    # ids go in the request body, SIMILARITY_BATCH at a time
+    assert [p['business_ids'] for name, p in sb.rpc_calls if name == 'skill_similarities'] == [['b1', 'b2'], ['b3']]
+    assert 'Strategy Consulting' in chat.calls[0]['messages'][0]['content']
+    assert 'AI T-Shirt Store' not in chat.calls[0]['messages'][0]['content']
+
+
+def test_similarity_errors_fall_back_to_the_chat_prompt(sb, monkeypatch):
+    chat = use_chat(monkeypatch, FakeChat(json.dumps([{'i': 0, 's': 0.4}])), FakeEmbeddings())
+    status, body = recommend(min_score=0.0)
+    assert status == 200
+    assert len(chat.calls) == 1
+    assert chat.calls[0]['messages'][0]['content'].count(' | Industries: ') == 3
+
+
+def test_backfill_writes_one_batch_per_call(sb, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(backfill_embeddings, 'get_supabase', lambda: sb)
+    monkeypatch.setattr(backfill_embeddings, 'get_openai', lambda: types.SimpleNamespace(embeddings=embeddings))
+    monkeypatch.setattr(backfill_embeddings, 'BATCH_SIZE', 2)
+    sb.rpcs['set_skill_embeddings'] = lambda params: len(params['embeddings'])
+    assert backfill_embeddings.backfill(only_missing=False) == 3
+    written = [[e['id'] for e in p['embeddings']] for _, p in sb.rpc_calls]
+    assert written == [['b1', 'b2'], ['b3']]
+    assert len(embeddings.calls) == 2
+
+
+def test_cost_ranges_are_parsed_once_per_cost_string(sb):
+    api._business_features.cache_clear()
+    recommend(use_ai=False)
+    recommend(use_ai=False)
+    info = api._business_features.cache_info()
+    assert (info.misses, info.hits) == (3, 3)
+    # an edited blueprint misses the cache instead of reusing the old range
+    sb.tables['blueprints'][0]['startup_cost'] = '$2,000–$4,000'
+    status, body = recommend(use_ai=False, min_score=0.0)
+    cost = {r['business_id']: r['breakdown']['startup_cost'] for r in body['recommendations']}
+    assert cost['b1'] == 0.4
+
+
+# ===== Reference: the per-business scoring score_businesses() replaced =====
+
+def reference_total(user_data, business, s_skill):
+    min_cost, max_cost = api.parse_cost_range(business.get('startup_cost', '$0'))
+    budget = user_data.get('investment_budget', 0)
+    if min_cost == 0 and max_cost == 0: s_cost = 0.8
+    elif budget >= (min_cost + max_cost) / 2: s_cost = 1.0
+    elif budget >= min_cost: s_cost = 0.7
+    elif budget >= min_cost * 0.5: s_cost = 0.4
+    else: s_cost = 0.1
+    actual = {0: 5, 1: 10, 2: 20, 3: 30}.get(user_data.get('weekly_hours', 1), 10)
+    required = {'Beginner': 10, 'Intermediate': 15, 'Advanced': 20, '': 15}.get(
+        business.get('skill_level', 'Intermediate'), 15)
+    if actual >= required * 1.5: s_time = 1.0
+    elif actual >= required: s_time = 0.9
+    elif actual >= required * 0.7: s_time = 0.6
+    else: s_time = 0.3
+    return round((s_cost * 0.25) + (s_time * 0.2) + (s_skill * 0.2) + 0.35, 3)
+
+
+GRID_COSTS = ['$100–$500', '$1,000-$3,000', '$5,000', 'Varies', '', '$400 to $2,400', '$20,000–$50,000']
+GRID_LEVELS = ['Beginner', 'Intermediate', 'Advanced', '', 'Expert']
+GRID_SKILLS = [0.0, 0.1475, 0.2375, 0.5, 0.61, 0.8015, 1.0]
+
+
+def test_score_businesses_matches_per_business_scoring():
+    businesses = [{'id': f'g{n}', 'startup_cost': cost, 'skill_level': level}
+                  for n, (cost, level) in enumerate((c, l) for c in GRID_COSTS for l in GRID_LEVELS)]
+    for budget in (0, 300, 1500, 2400, 60000):
+        for hours in (0, 1, 2, 3):
+            user = {'investment_budget': budget, 'weekly_hours': hours}
+            for s_skill in GRID_SKILLS:
+                skill = {b['id']: s_skill for b in businesses}
+                results = api.score_businesses(user, businesses, skill, min_score=0.0, limit=len(businesses))
+                expected = sorted(((reference_total(user, b, s_skill), b['id']) for b in businesses),
+                                  key=lambda x: x[0], reverse=True)
+                assert [(r['total_score'], r['business_id']) for r in results] == expected
+
+
+def test_score_businesses_rounds_ties_like_round():
+    # 0.8 * 0.25 + 1.0 * 0.2 + 0.1475 * 0.2 + 0.35 = 0.7795: round() gives 0.779, np.round 0.78
+    user = {'investment_budget': 0, 'weekly_hours': 3}
+    businesses = [{'id': 'tie', 'startup_cost': 'Varies', 'skill_level': 'Beginner'}]
+    [result] = api.score_businesses(user, businesses, {'tie': 0.1475}, min_score=0.0)
+    assert result['total_score'] == 0.779
+    assert api.score_businesses(user, businesses, {'tie': 0.1475}, min_score=0.78) == []
+
+
+def test_candidates_come_from_the_rpc(sb, chat):
+    sb.rpcs['recommend_candidates'] = lambda params: [dict(BLUEPRINTS[1])]
+    sb.tables['users'][0]['quiz_responses'] = dict(USER, avoidances=['delivery', 'door'])
+    status, body = recommend(use_ai=False, min_score=0.5)
+    assert status == 200
+    assert [r['business_id'] for r in body['recommendations']] == ['b2']
+    assert sb.rpc_calls == [('recommend_candidates', {
+        'user_budget': 1500, 'user_hours': 20, 'min_score': 0.5,
+        'avoid_industries': ['Delivery', 'Door-to-Door', 'Mobile Services', 'Sales']})]
+    # only the display fields for the returned row come from the table
+    assert [columns for name, columns in sb.queries if name == 'blueprints'] == [
+        ['id', 'thumbnail_url', 'video_link', 'summary']]
+
+
+def test_fallback_drops_avoided_industries(sb, chat):
+    sb.tables['users'][0]['quiz_responses'] = dict(USER, avoidances=['children'])
+    sb.tables['blueprints'][1]['industry'] = ['Retail', 'Kids']
+    status, body = recommend(use_ai=False, min_score=0.0)
+    assert [r['business_id'] for r in body['recommendations']] == ['b1', 'b3']
+
+
+def test_no_candidates_is_an_empty_result(sb, chat):
+    sb.rpcs['recommend_candidates'] = lambda params: []
+    status, body = recommend(use_ai=False, min_score=0.99)
+    assert (status, body) == (200, {'success': True, 'recommendations': []})
+
+
+def test_empty_catalog_is_not_found(sb, chat):
+    sb.rpcs['recommend_candidates'] = lambda params: []
+    sb.tables['blueprints'] = []
+    status, body = recommend(use_ai=False)
+    assert (status, body) == (404, {'error': 'No businesses found'})
+
+
+def test_stored_cost_bounds_replace_parsing(sb, chat):
+    # recommend_candidates returns the generated columns; NULL means "parse it in Python"
+    rows = [dict(BLUEPRINTS[0], startup_cost_min=2000, startup_cost_max=4000),
+            dict(BLUEPRINTS[1], startup_cost_min=None, startup_cost_max=None)]
+    sb.rpcs['recommend_candidates'] = lambda params: rows
+    status, body = recommend(use_ai=False, min_score=0.0)
+    cost = {r['business_id']: r['breakdown']['startup_cost'] for r in body['recommendations']}
+    assert cost == {'b1': 0.4, 'b2': 1.0}
+
+
+def test_responses_are_orjson_encoded(sb, chat):
+    response = api.app.test_client().post('/api/recommend', data=b'{"user_id": "u1", "use_ai": false}')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.data.startswith(b'{"success":true,"recommendations":[{')
+    missing = api.app.test_client().post('/api/recommend', data=b'{}')
+    assert (missing.status_code, missing.get_json()) == (400, {'error': 'user_id required'})
+
+
+def test_display_fields_are_fetched_for_the_top_k_only(sb, chat):
+    status, body = recommend(use_ai=False, min_score=0.0, limit=2)
+    assert [r['business_id'] for r in body['recommendations']] == ['b1', 'b2']
+    assert body['recommendations'][0]['thumbnail_url'] == 't1.png'
+    assert body['recommendations'][1]['summary'] is None
+    scoring, display = [columns for name, columns in sb.queries if name == 'blueprints']
+    assert 'thumbnail_url' not in scoring
+    assert display == ['id', 'thumbnail_url', 'video_link', 'summary']
+
+
+def test_openai_client_is_created_once(monkeypatch):
+    monkeypatch.setattr(api, '_openai_client', None)
+    monkeypatch.setattr(api.openai, 'api_key', 'sk-test')
+    client = api.get_openai()
+    assert api.get_openai() is client
+
+
+@pytest.mark.parametrize('cost_str, expected', [
+    ('$1,000–$3,000', (1000, 3000)),
+    ('$500 - $1,000', (500, 1000)),
+    ('$2,000 to $5,000', (2000, 5000)),
+    (' $250 ', (250, 250)),
+    ('', (0, 0)),
+    ('varies', (0, 0)),
+    ('5k-10k', (0, 0)),
+    ('$1-$2-$3', (0, 0)),
+    ('100–200-300', (0, 0)),
+    # Signed values keep the original per-separator int() rules
+    ('9--1', (0, 0)),
+    ('-5–10', (-5, 10)),
+    ('-5', (-5, -5)),
+])
+def test_parse_cost_range(cost_str, expected):
+    assert api.parse_cost_range(cost_str) == expected
+
+
+def test_candidates_are_cached_per_rpc_arguments(sb, chat, monkeypatch):
+    sb.rpcs['recommend_candidates'] = lambda params: [dict(b) for b in BLUEPRINTS]
+    clock = [100.0]
+    monkeypatch.setattr(api.time, 'monotonic', lambda: clock[0])
+    candidate_calls = lambda: sum(name == 'recommend_candidates' for name, _ in sb.rpc_calls)
+    recommend(use_ai=False, min_score=0.0)
+    recommend(use_ai=False, min_score=0.0)
+    assert candidate_calls() == 1
+    # a different min_score is a different RPC result
+    recommend(use_ai=False, min_score=0.5)
+    assert candidate_calls() == 2
+    clock[0] += api.BLUEPRINTS_TTL
+    recommend(use_ai=False, min_score=0.0)
+    assert candidate_calls() == 3
+    assert len(api._BLUEPRINTS_CACHE) == 1
+
+
+def test_blueprint_invalidation_needs_the_webhook_secret(monkeypatch):
+    client = api.app.test_client()
+    monkeypatch.setattr(api, '_BLUEPRINTS_CACHE', {'key': (0.0, [])})
+
+    monkeypatch.delenv('BLUEPRINTS_WEBHOOK_SECRET', raising=False)
+    assert client.post('/api/blueprints/invalidate').status_code == 404
+    assert 'key' in api._BLUEPRINTS_CACHE
+
+    monkeypatch.setenv('BLUEPRINTS_WEBHOOK_SECRET', 's3cret')
+    assert client.post('/api/blueprints/invalidate', headers={'X-Webhook-Secret': 'wrong'}).status_code == 401
+    assert 'key' in api._BLUEPRINTS_CACHE
+    assert client.post('/api/blueprints/invalidate', headers={'X-Webhook-Secret': 's3cret'}).status_code == 200
+    assert api._BLUEPRINTS_CACHE == {}
@@ -0,0 +1,1180 @@
+"""
+Tests for the Cloud Function scoring engine (recommendation_engine.py)
+No network access: get_supabase() and the OpenAI clients are replaced with fakes
+"""
+
+import asyncio
+import itertools
+import json
+import types
+
+import httpx
+import numpy as np
+import pytest
+
+import recommendation_engine as engine
+
+
+USER = {
+    'weekly_hours': 2,
+    'investment_budget': 1500,
+    'work_schedule': 'flexible',
+    'risk_tolerance': 'moderate',
+    'tech_comfort': 'very',
+    'background': 'Software developer with 5 years experience',
+    'skills': ['web_development', 'programming'],
+    'task_preference': 'creative',
+    'avoidances': ['heavy', 'delivery'],
+    'willing_to_learn': 'yes',
+}
+
+CATALOGUE = [
+    {'id': 'b1', 'title': 'AI-Powered T-Shirt Business', 'startup_cost': '$100–$500',
+     'estimated_monthly_profit': '$1,000–$10,000', 'skill_level': 'Beginner',
+     'industry': ['E-Commerce', 'Apparel', 'Print-on-Demand', 'Technology'],
+     'description': 'Design unique T-shirts and sell them online.', 'published': True},
+    {'id': 'b2', 'title': 'Weekend Farmers Market Stand', 'startup_cost': '$50–$200',
+     'estimated_monthly_profit': '$500–$2,000', 'skill_level': 'Beginner',
+     'industry': ['Retail', 'Food & Beverage'], 'description': 'Sell homemade goods.', 'published': True},
+    {'id': 'b3', 'title': 'Food Delivery Driver', 'startup_cost': '$200 to $500',
+     'estimated_monthly_profit': '$2,000–$5,000', 'skill_level': 'Beginner',
+     'industry': ['Delivery', 'Mobile Services'], 'description': 'Deliver meals.', 'published': True},
+    {'id': 'b4', 'title': 'Web Design Agency', 'startup_cost': '$500-$2,000',
+     'estimated_monthly_profit': '$3,000–$15,000', 'skill_level': 'Intermediate',
+     'industry': ['Technology', 'B2B Services'], 'description': 'Build websites for clients.', 'published': True},
+    {'id': 'b5', 'title': 'Luxury Consulting Firm', 'startup_cost': '$20,000–$50,000',
+     'estimated_monthly_profit': 'Varies', 'skill_level': 'Advanced',
+     'industry': ['Consulting'], 'description': 'High-end strategy consulting.', 'published': True},
+    {'id': 'b6', 'title': 'Pet Photography', 'startup_cost': 'Varies',
+     'estimated_monthly_profit': '$800', 'skill_level': 'Intermediate',
+     'industry': ['Creative', 'Pets'], 'description': 'Portraits of pets at home.', 'published': True},
+]
+
+
+class FakeQuery:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.filters = []
+
+        self.count = None
+        self.sort = None
+        self.row_limit = None
+        self.row = None
+
+    def select(self, columns='*', count=None):
+        self.columns = None if columns == '*' else columns.replace(' ', '').split(',')
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def order(self, column, desc=False):
+        self.sort = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def upsert(self, row, on_conflict=None):
+        self.row = row
+        return self
+
+    def execute(self):
+        table = self.db.tables.setdefault(self.name, [])
+        if self.row is not None:
+            self.db.upserts.append((self.name, self.row))
+            table[:] = [r for r in table if r['user_id'] != self.row['user_id']] + [dict(self.row)]
+            return types.SimpleNamespace(data=[self.row])
+        self.db.selects.append((self.name, self.columns))
+        if self.columns and self.db.missing_columns.intersection(self.columns):
+            raise RuntimeError('column blueprints.startup_cost_min does not exist')
+        rows = [dict(r) for r in table if all(f(r) for f in self.filters)]
+        if self.columns:
+            rows = [{k: r[k] for k in self.columns if k in r} for r in rows]
+        total = len(rows)
+        if self.sort:
+            rows.sort(key=lambda r: r.get(self.sort[0]) or '', reverse=self.sort[1])
+        return types.SimpleNamespace(data=rows[:self.row_limit], count=total if self.count else None)
+
+
+class FakeSupabase:
+    def __init__(self, catalogue=CATALOGUE, user=USER):
+        self.tables = {'users': [{'id': 'u1', 'quiz_responses': user}],
+                       'blueprints': [dict(b) for b in catalogue]}
+        self.upserts = []
+        self.selects = []
+        self.missing_columns = set()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeRequest:
+    method = 'POST'
+
+    def __init__(self, body):
+        self.body = body if isinstance(body, bytes) else json.dumps(body).encode()
+
+    def get_data(self):
+        return self.body
+
+
+@pytest.fixture(autouse=True)
+def fresh_businesses_cache(monkeypatch):
+    monkeypatch.setattr(engine, '_businesses_cache', {'fetched_at': 0.0, 'rev': None, 'data': None})
+
+
+class DeferredExecutor:
+    """Stand-in for _CACHE_EXECUTOR that runs submitted writes only when asked"""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def run(self):
+        while self.pending:
+            fn, args = self.pending.pop(0)
+            fn(*args)
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(engine, 'get_supabase', lambda: fake)
+    # cache writes run inline so tests see them straight away
+    monkeypatch.setattr(engine, '_CACHE_EXECUTOR', types.SimpleNamespace(submit=lambda fn, *args: fn(*args)))
+    return fake
+
+
+def recommend(**body):
+    payload, status, _ = engine.recommend_businesses(FakeRequest({'user_id': 'u1', **body}))
+    return status, json.loads(payload)
+
+
+# ===== COPIED FROM THE ORIGINAL check_avoidance_criteria =====
+
+def reference_avoidance(user_avoidances, business_industries, business_title, business_description):
+    if not user_avoidances or 'none' in user_avoidances:
+        return True
+    combined_text = ' '.join(business_industries).lower() + ' ' + business_title.lower()
+    if business_description:
+        combined_text += ' ' + business_description[:200].lower()
+    for avoidance in user_avoidances:
+        for term in engine.AVOIDANCE_MAP.get(avoidance, []):
+            if term.lower() in combined_text:
+                return False
+    return True
+
+
+AVOIDANCE_CASES = [
+    (['heavy'], ['Retail'], 'Day Laborer Crew', ''),
+    (['heavy'], ['Retail'], 'Gift Shop', ''),
+    (['delivery'], ['Food & Beverage'], 'Meal Prep', 'Food delivery in your area'),
+    (['delivery', 'nights'], ['NIGHTCLUB promotions'], 'Promoter', None),
+    (['children'], ['Consulting'], 'Advisor', 'x' * 200 + ' children'),
+    (['door', 'none'], ['Sales'], 'Door-to-Door Sales', ''),
+    ([], ['Sales'], 'Door-to-Door Sales', ''),
+    (['unknown'], ['Sales'], 'Door-to-Door Sales', ''),
+]
+
+
+@pytest.mark.parametrize('avoidances, industries, title, description', AVOIDANCE_CASES)
+def test_avoidance_pattern_matches_the_substring_check(avoidances, industries, title, description):
+    expected = reference_avoidance(avoidances, industries, title, description)
+    assert engine.check_avoidance_criteria(avoidances, industries, title, description) == expected
+    pattern = engine.build_avoidance_pattern(avoidances)
+    assert engine.check_avoidance_criteria(avoidances, industries, title, description, pattern) == expected
+    business = engine.precompute_text_fields({'industry': industries, 'title': title, 'description': description})
+    assert engine.check_avoidance_criteria(avoidances, (), '', '', pattern, business['_avoid_text']) == expected
+
+
+def test_avoidance_patterns_are_built_once_per_combination():
+    answers = sorted(engine.AVOIDANCE_MAP)
+    assert engine.build_avoidance_pattern([answers[0]]) is engine.AVOIDANCE_RE[answers[0]]
+    pair = engine.build_avoidance_pattern([answers[0], answers[1]])
+    assert engine.build_avoidance_pattern([answers[1], answers[0], answers[1]]) is pair
+    # every term of every answer is matched, and only the user's answers count
+    for user_avoidances in itertools.combinations(answers, 2):
+        for avoidance in answers:
+            for term in engine.AVOIDANCE_MAP[avoidance]:
+                expected = reference_avoidance(list(user_avoidances), [], term.upper(), '')
+                pattern = engine.build_avoidance_pattern(list(user_avoidances))
+                assert engine.check_avoidance_criteria(list(user_avoidances), [], term.upper(), '',
+                                                       pattern) == expected
+
+
+@pytest.mark.parametrize('avoidances, industries, title, description', AVOIDANCE_CASES)
+def test_avoidance_masks_match_the_substring_check(avoidances, industries, title, description):
+    expected = reference_avoidance(avoidances, industries, title, description)
+    business = engine.precompute_text_fields({'industry': industries, 'title': title, 'description': description})
+    assert (business['_avoid_mask'] & engine.user_avoidance_mask(avoidances) == 0) == expected
+
+
+def test_avoidance_masks_cover_every_term():
+    answers = sorted(engine.AVOIDANCE_MAP)
+    for avoidance in answers:
+        for term in engine.AVOIDANCE_MAP[avoidance]:
+            business = engine.precompute_text_fields({'industry': [], 'title': term.upper()})
+            for user_avoidances in itertools.combinations(answers, 2):
+                expected = reference_avoidance(list(user_avoidances), [], term.upper(), '')
+                avoid_mask = engine.user_avoidance_mask(list(user_avoidances))
+                assert (business['_avoid_mask'] & avoid_mask == 0) == expected
+
+
+def test_score_catalogue_zeroes_avoided_rows():
+    user = dict(USER, avoidances=['door', 'delivery', 'children'])
+    businesses = [dict(b) for b in KERNEL_CATALOGUE]
+    totals = engine.score_catalogue(user, businesses)
+    avoided = [not reference_avoidance(user['avoidances'], b['industry'], b['title'], b['description'])
+               for b in KERNEL_CATALOGUE]
+    assert [t == 0.0 for t in totals] == avoided and any(avoided)
+
+
+@pytest.mark.parametrize('cost_str, expected', [
+    ('$1,000–$3,000', (1000, 3000)),
+    ('$500 - $1,000', (500, 1000)),
+    ('$2,000 to $5,000', (2000, 5000)),
+    (' $250 ', (250, 250)),
+    ('', (0, 0)),
+    ('varies', (0, 0)),
+    ('5k-10k', (0, 0)),
+    ('$1-$2-$3', (0, 0)),
+    ('100–200-300', (0, 0)),
+    # Signed values can't be costs and read as unparseable
+    ('9--1', (0, 0)),
+    ('-5–10', (0, 0)),
+    ('-5', (0, 0)),
+])
+def test_parse_cost_range(cost_str, expected):
+    assert engine.parse_cost_range(cost_str) == expected
+
+
+def test_parse_cost_range_is_memoized():
+    engine.parse_cost_range.cache_clear()
+    assert [engine.parse_cost_range(b['startup_cost']) for b in CATALOGUE * 3][:2] == [(100, 500), (50, 200)]
+    info = engine.parse_cost_range.cache_info()
+    assert (info.misses, info.hits) == (len(CATALOGUE), 2 * len(CATALOGUE))
+
+
+@pytest.mark.parametrize('business, expected', [
+    ({'startup_cost_min': 200, 'startup_cost_max': 900, 'startup_cost': 'Varies'}, (200, 900)),
+    ({'startup_cost_min': None, 'startup_cost_max': None, 'startup_cost': '$250'}, (250, 250)),
+    ({'startup_cost': '$1,000–$3,000'}, (1000, 3000)),
+])
+def test_stored_range_falls_back_to_parsing(business, expected):
+    assert engine.stored_range(business, 'startup_cost', 'startup_cost') == expected
+
+
+def batch_listing(kwargs):
+    """Businesses listed in a skill_match_batch_messages() prompt"""
+    return json.loads(kwargs['messages'][-1]['content'].removeprefix('BUSINESSES:\n'))
+
+
+def batch_reply(kwargs, score):
+    """JSON-mode reply giving every listed business `score`"""
+    content = json.dumps({item['id']: score for item in batch_listing(kwargs)})
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+
+class SlowChat:
+    """Rates every business 0.8 after a short wait and records how many calls overlapped"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.batches = []
+        self.system_prompts = []
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.batches.append([item['title'] for item in batch_listing(kwargs)])
+        self.system_prompts.append(kwargs['messages'][0]['content'])
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return batch_reply(kwargs, 0.8)
+
+
+def use_async_chat(monkeypatch, chat):
+    """Route score_skill_matches' shared AsyncOpenAI client to `chat`"""
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=chat))
+    monkeypatch.setattr(engine, 'get_async_openai', lambda: client)
+    # the semaphore is built on first use from OPENAI_MAX_CONCURRENCY
+    monkeypatch.setattr(engine, '_async_openai_semaphore', None)
+    return chat
+
+
+def test_ai_scoring_is_concurrent_but_bounded(sb, monkeypatch):
+    chat = use_async_chat(monkeypatch, SlowChat())
+    monkeypatch.setattr(engine, 'OPENAI_MAX_CONCURRENCY', 2)
+    monkeypatch.setattr(engine, 'SKILL_BATCH_SIZE', 2)
+    status, body = recommend(min_score=0.0)
+    assert status == 200
+    # five businesses pass avoidance: batches of two, at most two in flight
+    assert [len(batch) for batch in chat.batches] == [2, 2, 1]
+    assert chat.peak == 2
+    # every batch shares one cacheable prefix: the profile, with no business text
+    assert len(set(chat.system_prompts)) == 1
+    assert USER['background'] in chat.system_prompts[0]
+    assert not any(b['title'] in chat.system_prompts[0] for b in CATALOGUE)
+    expected = [engine.calculate_business_score(USER, dict(b), use_ai=True, skill_score=0.8) for b in CATALOGUE]
+    expected.sort(key=lambda x: x['total_score'], reverse=True)
+    assert body['recommendations'] == json.loads(json.dumps(expected[:10]))
+
+
+class FailingChat:
+    """Raises `error` on every call"""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+def test_failed_batch_falls_back_to_keyword_matching(monkeypatch):
+    chat = use_async_chat(monkeypatch, FailingChat(ValueError('bad reply')))
+    businesses = [engine.precompute_text_fields(dict(b)) for b in CATALOGUE[:3]]
+    basic = [engine.basic_skill_match(USER['background'], USER['skills'], b['title'], b['industry'], b)
+             for b in businesses]
+    assert engine.score_skill_matches(USER, businesses) == basic
+    assert chat.calls == 1
+
+
+def test_shared_async_client_is_reused_and_retries_rate_limits(monkeypatch):
+    replies = [httpx.Response(429, headers={'retry-after-ms': '1'}, json={'error': {'message': 'slow down'}})]
+
+    def handler(request):
+        if replies:
+            return replies.pop(0)
+        listing = batch_listing(json.loads(request.content))
+        return httpx.Response(200, json={
+            'id': 'c1', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o-mini',
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                'role': 'assistant', 'content': json.dumps({item['id']: 0.6 for item in listing})}}]
+        })
+
+    real_async_client = httpx.AsyncClient
+    monkeypatch.setattr(engine.httpx, 'AsyncClient',
+                        lambda **kwargs: real_async_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(engine.openai, 'api_key', 'sk-test')
+    monkeypatch.setattr(engine, '_async_openai_client', None)
+    monkeypatch.setattr(engine, '_async_openai_semaphore', None)
+    businesses = [engine.precompute_text_fields(dict(b)) for b in CATALOGUE[:2]]
+    assert engine.score_skill_matches(USER, businesses) == [0.6, 0.6]
+    assert replies == []  # the 429 was retried by the SDK
+    client = engine.get_async_openai()
+    assert engine.score_skill_matches(USER, businesses) == [0.6, 0.6]
+    assert engine.get_async_openai() is client and client.max_retries == engine.OPENAI_MAX_RETRIES
+
+
+class FixedChat:
+    """Answers every chat completion with the same content"""
+
+    def __init__(self, content):
+        self.content = content
+
+    async def create(self, **kwargs):
+        message = types.SimpleNamespace(content=self.content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def test_batch_skill_scores_clamp_and_fall_back_per_business(monkeypatch):
+    use_async_chat(monkeypatch, FixedChat(json.dumps({'0': 1.7, '1': 'high', '3': -0.2})))
+    businesses = [engine.precompute_text_fields(dict(b)) for b in CATALOGUE[:4]]
+    basic = [engine.basic_skill_match(USER['background'], USER['skills'], b['title'], b['industry'], b)
+             for b in businesses]
+    # '1' is not a number and '2' is missing; both keep the keyword score
+    assert engine.score_skill_matches(USER, businesses) == [1.0, basic[1], basic[2], 0.0]
+
+
+def test_batch_fallback_scores_the_missing_businesses_together(monkeypatch):
+    use_async_chat(monkeypatch, FixedChat(json.dumps({'1': 0.9})))
+    calls = []
+    real_basic = engine.basic_skill_matches
+
+    def recording_basic(background, skills, businesses):
+        calls.append([b['id'] for b in businesses])
+        return real_basic(background, skills, businesses)
+
+    monkeypatch.setattr(engine, 'basic_skill_matches', recording_basic)
+    monkeypatch.setattr(engine, 'basic_skill_match', None)
+    businesses = [engine.precompute_text_fields(dict(b)) for b in CATALOGUE[:4]]
+    scores = engine.score_skill_matches(USER, businesses)
+    assert calls == [['b1', 'b3', 'b4']]
+    assert scores == [real_basic(USER['background'], USER['skills'], [b])[0] if i != 1 else 0.9
+                      for i, b in enumerate(businesses)]
+
+
+class RecordingChat:
+    """Rates every listed business 0.5 and keeps the request arguments"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return batch_reply(kwargs, 0.5)
+
+
+def test_batches_require_exactly_their_ids(monkeypatch):
+    chat = use_async_chat(monkeypatch, RecordingChat())
+    monkeypatch.setattr(engine, 'SKILL_BATCH_SIZE', 4)
+    businesses = [engine.precompute_text_fields(dict(b)) for b in CATALOGUE]
+    assert engine.score_skill_matches(USER, businesses) == [0.5] * len(CATALOGUE)
+    for request in chat.requests:
+        ids = [item['id'] for item in batch_listing(request)]
+        fmt = request['response_format']
+        assert fmt['type'] == 'json_schema' and fmt['json_schema']['strict'] is True
+        schema = fmt['json_schema']['schema']
+        assert schema['required'] == ids and list(schema['properties']) == ids
+        assert schema['additionalProperties'] is False
+    assert [len(r['response_format']['json_schema']['schema']['required']) for r in chat.requests] == [4, 2]
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('{"score": 0.75}', 0.75),
+    ('{"score": 1.4}', 1.0),
+    ('{"score": -0.1}', 0.0),
+])
+def test_single_skill_score_reads_the_structured_reply(content, expected, monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(engine, 'get_openai', lambda: client)
+    b = CATALOGUE[3]
+    score = engine.score_skill_match_ai(USER['background'], USER['skills'], b['industry'], b['title'],
+                                        b['description'], USER['willing_to_learn'])
+    assert score == expected
+    assert requests[0]['response_format'] == engine.skill_score_response_format(['score'])
+    assert '{"score": 0.75}' in requests[0]['messages'][0]['content']
+
+
+USER_VARIANTS = [
+    {},
+    {'investment_budget': 300, 'weekly_hours': 0, 'risk_tolerance': 'very_low', 'tech_comfort': 'none',
+     'work_schedule': 'weekends', 'task_preference': 'social'},
+    {'investment_budget': 1500, 'weekly_hours': 2, 'risk_tolerance': 'moderate', 'tech_comfort': 'very',
+     'work_schedule': 'evenings', 'task_preference': 'creative'},
+    {'investment_budget': 60000, 'weekly_hours': 3, 'risk_tolerance': 'high', 'tech_comfort': 'minimal',
+     'work_schedule': 'weekdays', 'task_preference': 'analytical'},
+    {'work_schedule': 'early', 'task_preference': 'structured'},
+    {'work_schedule': 'nights', 'task_preference': 'unknown'},
+]
+
+# CATALOGUE plus the industry lists the mask paths treat specially
+KERNEL_CATALOGUE = CATALOGUE + [
+    dict(CATALOGUE[1], id='k1', industry=[]),
+    dict(CATALOGUE[1], id='k2', industry=['Sales', 'Sales']),
+    dict(CATALOGUE[1], id='k3', industry=['Technology', 'Technology', 'Pets']),
+    dict(CATALOGUE[1], id='k4', industry=['Unlisted', 'Also Unlisted']),
+    dict(CATALOGUE[1], id='k5', industry=['Events', 'Hospitality', 'Cleaning']),
+]
+
+
+def scalar_components(user, business):
+    """Every deterministic component from the scalar scorers, in kernel order"""
+    return {
+        'startup_cost': engine.score_startup_cost(user.get('investment_budget', 0), business['startup_cost']),
+        'time_commitment': engine.score_time_commitment(user.get('weekly_hours', 1), business['skill_level']),
+        'schedule_fit': engine.score_schedule_fit(user.get('work_schedule', 'flexible'), business['industry']),
+        'risk_tolerance': engine.score_risk_tolerance(user.get('risk_tolerance', 'moderate'),
+                                                      business['estimated_monthly_profit'],
+                                                      business['startup_cost']),
+        'tech_comfort': engine.score_tech_comfort(user.get('tech_comfort', 'moderate'),
+                                                  business['industry'], business['title']),
+        'task_preference': engine.score_task_preference(user.get('task_preference', 'mixed'),
+                                                        business['industry'], business['description']),
+    }
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS)
+def test_kernel_matches_scalar_scorers(user):
+    businesses = [dict(b) for b in KERNEL_CATALOGUE]
+    expected = [scalar_components(user, b) for b in KERNEL_CATALOGUE]
+    assert engine.score_numeric_components(user, businesses) == expected
+    # and the scalar path of deterministic_scores agrees with the kernel row
+    assert [engine.deterministic_scores({**user, 'avoidances': []}, b) for b in businesses] == expected
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_score_catalogue_matches_the_scalar_totals(user):
+    businesses = [dict(b) for b in KERNEL_CATALOGUE]
+    expected = []
+    for b in KERNEL_CATALOGUE:
+        if engine.deterministic_scores(user, dict(b)) is None:
+            expected.append(0.0)
+            continue
+        scores = dict(scalar_components(user, b), skill_match=engine.basic_skill_match(
+            user.get('background', ''), user.get('skills', []), b['title'], b['industry'], dict(b)))
+        expected.append(sum(scores[key] * weight for key, weight in engine.WEIGHTS.items()))
+    totals = engine.score_catalogue(user, businesses)
+    assert totals.shape == (len(KERNEL_CATALOGUE),)
+    # the kernel sums in WEIGHTS order without reassociating, so the totals are exact
+    assert totals.tolist() == expected
+    assert engine.score_catalogue(user, []).shape == (0,)
+
+
+def test_user_codes_use_the_scalar_defaults():
+    assert engine.user_codes({}) == engine.UserCodes(budget=0, hours=10, risk=2, tech=2, schedule_mask=0,
+                                                     schedule_hit=1.0, schedule_miss=1.0, task_mask=0,
+                                                     avoid_mask=0)
+    codes = engine.user_codes(USER)
+    assert (codes.budget, codes.hours, codes.tech) == (1500, 20, 3)
+    assert codes.task_mask == engine._TASK_PREFERENCE_MASKS['creative']
+    assert codes.avoid_mask == engine.AVOIDANCE_BIT['heavy'] | engine.AVOIDANCE_BIT['delivery']
+
+
+def test_batch_scorers_decode_the_user_once(monkeypatch):
+    calls = []
+    real_codes = engine.user_codes
+    monkeypatch.setattr(engine, 'user_codes', lambda user_data: calls.append(user_data) or real_codes(user_data))
+    businesses = [dict(b) for b in CATALOGUE]
+    engine.score_catalogue(USER, businesses)
+    engine.score_businesses(USER, businesses)
+    assert calls == [USER, USER]
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS)
+def test_kernel_totals_without_skill_are_the_deterministic_floors(user):
+    businesses = [dict(b) for b in KERNEL_CATALOGUE]
+    _, floors = engine.score_arrays(engine.user_codes(user), engine.business_arrays(businesses))
+    assert floors.tolist() == [engine.deterministic_floor(scalar_components(user, b)) for b in KERNEL_CATALOGUE]
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_cython_kernel_matches_numba(user):
+    scoring_kernel_c = pytest.importorskip('scoring_kernel_c')
+    arrays = engine.business_arrays([dict(b) for b in KERNEL_CATALOGUE])
+    columns = [arrays[key] for key in ('min_cost', 'max_cost', 'level_hours', 'tech_lvl', 'risk_lvl', 'ind_mask',
+                                       'repeat_mask')]
+    codes = engine.user_codes(user)
+    user_arr = np.array([codes.budget, codes.hours, codes.risk, codes.tech, codes.schedule_hit, codes.schedule_miss],
+                        dtype=np.float64)
+    user_masks = np.array([codes.schedule_mask, codes.task_mask], dtype=np.int64)
+    skill = np.array([(i % 5) / 4 for i in range(len(KERNEL_CATALOGUE))])
+    expected = engine.scoring_kernel.score_all(user_arr, user_masks, *columns, skill, engine._KERNEL_WEIGHTS)
+    got = scoring_kernel_c.score_all(user_arr, user_masks, *columns, skill, engine._KERNEL_WEIGHTS)
+    assert np.array_equal(got[0], expected[0]) and np.array_equal(got[1], expected[1])
+
+
+@pytest.mark.parametrize('min_score, limit', [(0.3, 10), (0.0, 20), (0.0, 3), (0.6, 2), (0.3, 0)])
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_score_businesses_matches_per_business_scoring(user, min_score, limit):
+    singles = [engine.calculate_business_score(user, dict(b), use_ai=False) for b in KERNEL_CATALOGUE]
+    expected = sorted((r for r in singles if r['total_score'] >= min_score),
+                      key=lambda r: r['total_score'], reverse=True)[:limit]
+    assert engine.score_businesses(user, [dict(b) for b in KERNEL_CATALOGUE], min_score, limit) == expected
+
+
+@pytest.mark.parametrize('min_score, limit', [(0.3, 10), (0.7, 10), (0.0, 1), (0.3, 2), (0.6, 3)])
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_score_businesses_prunes_like_the_handler(user, min_score, limit, monkeypatch):
+    scored = []
+    real_basic = engine.basic_skill_matches
+
+    def recording_basic(background, skills, businesses):
+        scored.extend(b['id'] for b in businesses)
+        return real_basic(background, skills, businesses)
+
+    monkeypatch.setattr(engine, 'basic_skill_matches', recording_basic)
+    engine.score_businesses(user, [dict(b) for b in KERNEL_CATALOGUE], min_score, limit)
+    candidates = [(b, engine.deterministic_scores(user, dict(b))) for b in KERNEL_CATALOGUE]
+    kept = engine.top_k_candidates([c for c in candidates if c[1] is not None], limit, min_score)
+    assert scored == [b['id'] for b, _ in kept]
+
+
+def test_score_businesses_skips_hopeless_skill_matches(monkeypatch):
+    scored = []
+    real_basic = engine.basic_skill_matches
+    monkeypatch.setattr(engine, 'basic_skill_matches',
+                        lambda bg, skills, businesses: scored.extend(b['id'] for b in businesses)
+                        or real_basic(bg, skills, businesses))
+    results = engine.score_businesses(USER, [dict(b) for b in CATALOGUE], min_score=0.7)
+    # b3 is avoided and b5 cannot reach 0.7 even with a perfect skill match
+    assert scored == ['b1', 'b2', 'b4', 'b6']
+    assert [r['business_id'] for r in results] == ['b1', 'b4', 'b2']
+
+
+# ===== COPIED FROM THE ORIGINAL basic_skill_match =====
+
+def reference_skill_match(background, skills, title, industries):
+    background_lower = background.lower() if background else ''
+    title_lower = title.lower() if title else ''
+    industries_lower = [ind.lower() for ind in industries] if industries else []
+    skills_lower = [skill.lower() for skill in skills] if skills else []
+    matches = 0
+    for ind in industries_lower:
+        if ind in background_lower:
+            matches += 1
+    for skill in skills_lower:
+        if skill in title_lower or any(skill in ind for ind in industries_lower):
+            matches += 1
+    for word in title_lower.split():
+        if len(word) > 4 and word in background_lower:
+            matches += 0.5
+    return min(1.0, matches * 0.25)
+
+
+SKILL_PROFILES = [
+    ('', []),
+    ('Software developer who loves technology', ['web_development', 'programming']),
+    ('Ran a consulting practice for ten years', ['Consulting', 'sales']),
+    ('Photographer and retail manager', ['photo', 'RETAIL']),
+    # 'phycre' only appears across the title/industry boundary; '' is in everything
+    ('Creative photography fan', ['phycre', 'esst', '']),
+]
+
+
+@pytest.mark.parametrize('background, skills', SKILL_PROFILES)
+def test_precomputed_text_fields_match_raw_scoring(background, skills):
+    user = dict(USER, background=background, skills=skills)
+    for raw in CATALOGUE:
+        business = engine.precompute_text_fields(dict(raw))
+        assert (engine.basic_skill_match(background, skills, raw['title'], raw['industry'], business)
+                == engine.basic_skill_match(background, skills, raw['title'], raw['industry']))
+        assert (engine.calculate_business_score(user, business, use_ai=False)
+                == engine.calculate_business_score(user, dict(raw), use_ai=False))
+
+
+@pytest.mark.parametrize('background, skills', SKILL_PROFILES)
+def test_basic_skill_matches_equal_the_original_scorer(background, skills):
+    expected = [reference_skill_match(background, skills, b['title'], b['industry']) for b in KERNEL_CATALOGUE]
+    assert engine.basic_skill_matches(background, skills, [dict(b) for b in KERNEL_CATALOGUE]) == expected
+    assert [engine.basic_skill_match(background, skills, b['title'], b['industry'])
+            for b in KERNEL_CATALOGUE] == expected
+
+
+@pytest.mark.parametrize('industries, expected', [
+    (['Sales'], 0.7),
+    (['Sales', 'Sales'], 1.0),
+    (['Sales', 'Events'], 1.0),
+    (['Sales', 'Retail', 'Retail'], 0.7),
+    (['Retail'], 0.4),
+    ([], 0.7),
+])
+def test_task_preference_counts_every_listed_industry(industries, expected):
+    assert engine.score_task_preference('social', industries, '') == expected
+    business = dict(CATALOGUE[1], industry=industries)
+    user = dict(USER, task_preference='social')
+    assert engine.calculate_business_score(user, business, use_ai=False)['breakdown']['task_preference'] == expected
+
+
+# ===== COPIED FROM THE ORIGINAL score_schedule_fit / score_tech_comfort (list scans) =====
+
+def reference_schedule_fit(user_schedule, business_industries):
+    if not business_industries:
+        return 0.7
+    weekend_businesses = ['Events', 'Event Planning', 'Street Vending', 'Hospitality']
+    flexible_businesses = ['E-Commerce', 'Print-on-Demand', 'Technology', 'Online Services']
+    weekday_businesses = ['B2B Services', 'Automotive', 'Consulting']
+    if user_schedule == 'flexible':
+        return 1.0
+    elif user_schedule == 'weekends':
+        return 0.9 if any(ind in weekend_businesses for ind in business_industries) else 0.5
+    elif user_schedule == 'weekdays':
+        return 0.9 if any(ind in weekday_businesses for ind in business_industries) else 0.6
+    elif user_schedule == 'evenings':
+        return 0.8 if any(ind in flexible_businesses for ind in business_industries) else 0.5
+    elif user_schedule == 'early':
+        return 0.7
+    return 0.6
+
+
+def reference_tech_level(business_industries):
+    if any(ind in ['E-Commerce', 'Technology', 'Print-on-Demand', 'Digital Services', 'AI']
+           for ind in business_industries):
+        return 3
+    elif any(ind in ['Marketing', 'Retail', 'Hospitality', 'Consulting'] for ind in business_industries):
+        return 2
+    elif any(ind in ['Street Vending', 'Food & Beverage', 'Physical Services', 'Cleaning']
+             for ind in business_industries):
+        return 1
+    return 2
+
+
+INDUSTRY_LISTS = [
+    ['Events'], ['Consulting', 'B2B Services'], ['Technology', 'Street Vending'], ['Cleaning'],
+    ['Pets', 'Creative'], ['Retail', 'Food & Beverage'], ['AI', 'AI'], ['Automotive', 'Unknown'],
+]
+
+
+def test_ingest_keeps_one_copy_of_each_industry_name():
+    # built at runtime so the strings start out as distinct objects
+    names = [''.join(['Tech', 'nology']), ''.join(['Pe', 'ts'])]
+    first = engine.precompute_text_fields({'title': 'A', 'industry': [names[0], names[1]]})
+    second = engine.precompute_text_fields({'title': 'B', 'industry': [''.join(['Tech', 'nology'])]})
+    assert first['industry'] == names and first['industry'][0] is second['industry'][0]
+    assert first['_ind_mask'] == engine.industry_mask(['Technology', 'Pets'])
+
+
+@pytest.mark.parametrize('industries', INDUSTRY_LISTS)
+def test_industry_bitmasks_match_the_list_checks(industries):
+    mask = engine.industry_mask(industries)
+    for schedule in ('flexible', 'weekends', 'weekdays', 'evenings', 'early', 'other'):
+        expected = reference_schedule_fit(schedule, industries)
+        assert engine.score_schedule_fit(schedule, industries) == expected
+        assert engine.score_schedule_fit(schedule, industries, mask) == expected
+    assert engine.business_tech_level(industries, mask) == reference_tech_level(industries)
+
+
+def test_request_hash_ignores_key_order_and_tracks_options():
+    quiz = {'skills': ['web'], 'weekly_hours': 2, 'avoidances': ['door']}
+    reordered = dict(reversed(list(quiz.items())))
+    base = engine.recommendation_request_hash(quiz, 10, 0.3, True)
+    assert engine.recommendation_request_hash(reordered, 10, 0.3, True) == base
+    assert engine.recommendation_request_hash(quiz, 5, 0.3, True) != base
+    assert engine.recommendation_request_hash(quiz, 10, 0.5, True) != base
+    assert engine.recommendation_request_hash(quiz, 10, 0.3, False) != base
+    assert engine.recommendation_request_hash({**quiz, 'weekly_hours': 3}, 10, 0.3, True) != base
+
+
+def test_cache_is_served_until_the_quiz_or_blueprints_change(sb):
+    for n, business in enumerate(sb.tables['blueprints']):
+        business['updated_at'] = f'2024-01-0{n + 1}'
+    status, first = recommend(use_ai=False)
+    assert status == 200 and 'cached' not in first
+    assert sb.tables['recommendations_cache'][0]['blueprints_rev'] == '6:2024-01-06'
+
+    status, second = recommend(use_ai=False)
+    assert second['cached'] is True
+    assert second['recommendations'] == first['recommendations']
+
+    # another limit is another request
+    assert 'cached' not in recommend(use_ai=False, limit=3)[1]
+    # an edited blueprint changes the revision
+    sb.tables['blueprints'][0]['updated_at'] = '2024-02-01'
+    assert 'cached' not in recommend(use_ai=False, limit=3)[1]
+    assert recommend(use_ai=False, limit=3)[1]['cached'] is True
+
+
+# ===== COPIED FROM THE ORIGINAL score_risk_tolerance / score_tech_comfort (if/elif chains) =====
+
+def reference_diff_score(diff, far_score):
+    if diff == 0:
+        return 1.0
+    elif diff == 1:
+        return 0.7
+    elif diff == 2:
+        return 0.4
+    return far_score
+
+
+@pytest.mark.parametrize('business_level', range(len(engine.RISK_LEVELS)))
+def test_risk_and_tech_tables_match_the_if_chains(business_level, monkeypatch):
+    monkeypatch.setattr(engine, 'business_risk_level', lambda profit, cost: business_level)
+    monkeypatch.setattr(engine, 'business_tech_level', lambda industries, mask=None: business_level)
+    for user_risk in engine.RISK_LEVELS + ['unknown', '']:
+        level = engine.RISK_LEVELS.index(user_risk) if user_risk in engine.RISK_LEVELS else 2
+        expected = reference_diff_score(abs(level - business_level), 0.2)
+        assert engine.score_risk_tolerance(user_risk, '', '', (1, 1), (1, 1)) == expected
+    for user_tech in list(engine.USER_TECH_MAP) + ['unknown']:
+        expected = reference_diff_score(abs(engine.USER_TECH_MAP.get(user_tech, 2) - business_level), 0.1)
+        assert engine.score_tech_comfort(user_tech, ['Retail'], '') == expected
+
+
+def test_top_k_matches_the_full_sort(monkeypatch):
+    catalogue = CATALOGUE + [dict(CATALOGUE[0], id='b1-copy'), dict(CATALOGUE[3], id='b4-copy')]
+    ranked = {}
+    for limit in (len(catalogue), 3):
+        fake = FakeSupabase(catalogue)
+        monkeypatch.setattr(engine, 'get_supabase', lambda: fake)
+        status, body = recommend(use_ai=False, min_score=0.0, limit=limit)
+        assert status == 200
+        ranked[limit] = [(r['business_id'], r['total_score']) for r in body['recommendations']]
+    full = ranked[len(catalogue)]
+    assert [score for _, score in full] == sorted((score for _, score in full), reverse=True)
+    # Copies tie with their originals and stay behind them, as with sorted()
+    ids = [business_id for business_id, _ in full]
+    assert ids.index('b1') < ids.index('b1-copy') and ids.index('b4') < ids.index('b4-copy')
+    assert ranked[3] == full[:3]
+
+
+class CountingChat:
+    """Rates every business a perfect skill match and records the titles it was sent"""
+
+    def __init__(self):
+        self.titles = set()
+
+    async def create(self, **kwargs):
+        self.titles.update(item['title'] for item in batch_listing(kwargs))
+        return batch_reply(kwargs, 1.0)
+
+
+@pytest.mark.parametrize('min_score, skipped', [
+    (0.0, []),
+    # b5's floor plus a perfect skill match is exactly 0.649, so it still gets the call
+    (0.649, []),
+    (0.65, ['Luxury Consulting Firm']),
+    (0.9, ['Luxury Consulting Firm', 'Pet Photography']),
+])
+def test_ai_call_is_skipped_below_min_score(min_score, skipped, monkeypatch):
+    def run(min_score):
+        chat = use_async_chat(monkeypatch, CountingChat())
+        fake = FakeSupabase()
+        monkeypatch.setattr(engine, 'get_supabase', lambda: fake)
+        status, body = recommend(min_score=min_score)
+        assert status == 200
+        return chat.titles, body['recommendations']
+    all_titles, everything = run(0.0)
+    titles, recommendations = run(min_score)
+    assert sorted(all_titles - titles) == skipped
+    assert recommendations == [r for r in everything if r['total_score'] >= min_score]
+
+
+def test_pruned_businesses_never_reach_skill_scoring(sb, monkeypatch):
+    deterministic, basic = [], []
+    real_deterministic, real_basic = engine.deterministic_scores, engine.basic_skill_matches
+
+    def counting_deterministic(user_data, business, *args):
+        deterministic.append(business['id'])
+        return real_deterministic(user_data, business, *args)
+
+    def counting_basic(background, skills, businesses):
+        basic.extend(b['title'] for b in businesses)
+        return real_basic(background, skills, businesses)
+
+    monkeypatch.setattr(engine, 'deterministic_scores', counting_deterministic)
+    monkeypatch.setattr(engine, 'basic_skill_matches', counting_basic)
+    status, body = recommend(use_ai=False, min_score=0.7)
+    assert status == 200
+    assert deterministic == ['b1', 'b2', 'b3', 'b4', 'b5', 'b6']
+    # b3 is avoided and b5 cannot reach 0.7 even with a perfect skill match
+    assert 'Food Delivery Driver' not in basic and 'Luxury Consulting Firm' not in basic
+    assert 'Pet Photography' in basic
+    assert [r['business_id'] for r in body['recommendations']] == ['b1', 'b4', 'b2']
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_total_score_is_the_reported_total(user):
+    for b in KERNEL_CATALOGUE:
+        partial = engine.deterministic_scores({**user, 'avoidances': []}, dict(b))
+        for skill in (0.0, 0.35, 1.0):
+            result = engine.calculate_business_score(user, dict(b), partial_scores=partial, skill_score=skill)
+            assert engine.total_score(partial, skill) == result['total_score']
+
+
+@pytest.mark.parametrize('limit', [1, 3, 10])
+def test_handler_formats_only_the_returned_businesses(sb, monkeypatch, limit):
+    formatted = []
+    real_calculate = engine.calculate_business_score
+
+    def recording_calculate(user_data, business, *args, **kwargs):
+        formatted.append(business['id'])
+        return real_calculate(user_data, business, *args, **kwargs)
+
+    monkeypatch.setattr(engine, 'calculate_business_score', recording_calculate)
+    status, body = recommend(use_ai=False, min_score=0.0, limit=limit)
+    assert status == 200
+    returned = [r['business_id'] for r in body['recommendations']]
+    # avoided businesses use the fixed result without going through the scorer
+    assert formatted == [b for b in returned if b != 'b3'] and len(returned) == min(limit, len(CATALOGUE))
+
+
+def test_avoided_businesses_are_listed_last_at_zero(sb):
+    status, body = recommend(use_ai=False, min_score=0.0)
+    assert status == 200
+    assert body['recommendations'][-1]['business_id'] == 'b3'
+    assert body['recommendations'][-1]['total_score'] == 0.0
+    assert body['total_matches'] == 6
+
+
+def test_supabase_client_is_built_once_on_a_pooled_session(monkeypatch):
+    old_session = httpx.Client(base_url='https://db.example/rest/v1', headers={'apikey': 'k'}, timeout=7)
+    created = []
+
+    def create_client(url, key):
+        created.append((url, key))
+        return types.SimpleNamespace(postgrest=types.SimpleNamespace(session=old_session))
+
+    monkeypatch.setattr(engine, 'create_client', create_client)
+    engine.get_supabase.cache_clear()
+    try:
+        client = engine.get_supabase()
+        assert engine.get_supabase() is client and len(created) == 1
+        session = client.postgrest.session
+        assert session is not old_session and old_session.is_closed
+        assert session.base_url == old_session.base_url and session.headers['apikey'] == 'k'
+        assert session.timeout == old_session.timeout
+    finally:
+        engine.get_supabase.cache_clear()
+
+
+def test_precomputed_business_fields_skip_parsing(monkeypatch):
+    expected = [engine.deterministic_scores(USER, dict(b)) for b in CATALOGUE]
+    businesses = [engine.precompute_business_fields(dict(b)) for b in CATALOGUE]
+    assert [b['_cost_range'] for b in businesses][:2] == [(100, 500), (50, 200)]
+    assert [b['_level_hours'] for b in businesses][:2] == [10, 10]
+
+    def no_parsing(*args):
+        raise AssertionError('cost string parsed again')
+
+    monkeypatch.setattr(engine, 'parse_cost_range', no_parsing)
+    monkeypatch.setattr(engine, 'stored_range', no_parsing)
+    numeric = engine.score_numeric_components(USER, businesses)
+    assert [engine.deterministic_scores(USER, b) for b in businesses] == expected
+    assert [engine.deterministic_scores(USER, b, None, n) for b, n in zip(businesses, numeric)] == expected
+
+
+def test_published_blueprints_are_reused_until_the_revision_moves(sb, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(engine.time, 'monotonic', lambda: clock[0])
+    first = engine.load_published_businesses('6|2026-01-01')
+    assert '_cost_range' in first[0][0]
+    sb.tables['blueprints'].append(dict(CATALOGUE[0], id='b7'))
+    assert engine.load_published_businesses('6|2026-01-01') is first
+    assert len(engine.load_published_businesses('7|2026-01-02')[0]) == 7
+    # without a revision only the TTL applies
+    sb.tables['blueprints'].pop()
+    assert len(engine.load_published_businesses(None)[0]) == 7
+    clock[0] += engine.BUSINESSES_TTL
+    assert len(engine.load_published_businesses(None)[0]) == 6
+
+
+@pytest.mark.parametrize('installed', [True, False])
+def test_blueprints_load_only_the_scored_columns(sb, installed):
+    sb.tables['blueprints'] = [dict(b, startup_cost_min=100, startup_cost_max=400, internal_notes='x')
+                               for b in CATALOGUE]
+    if not installed:
+        sb.missing_columns = {'startup_cost_min'}
+    businesses, _ = engine.load_published_businesses(None)
+    assert 'internal_notes' not in businesses[0] and 'published' not in businesses[0]
+    # the generated bounds win over the string when they are there
+    assert businesses[0]['_cost_range'] == ((100, 400) if installed else (100, 500))
+    selects = [columns for name, columns in sb.selects if name == 'blueprints']
+    assert 'startup_cost_min' in selects[0]
+    assert len(selects) == (1 if installed else 2)
+
+
+# Deterministic parts spread over the whole floor range, lowest first: a flat profile for every
+# tenth, near-duplicates one rounding step apart, and floors exactly one perfect skill match
+# under the 1st/2nd/3rd best floor, which tie it and win on catalogue order
+PARTIAL_PROFILES = [{key: v for key in engine.WEIGHTS if key != 'skill_match'} for v in
+                    sorted([i / 10 for i in range(11)] + [0.5 + 0.00125 * i for i in range(1, 5)]
+                           + [0.55, 0.65, 0.75])]
+PRUNING_CANDIDATES = [({'id': f'p{i}', 'title': f'P{i}'}, partial) for i, partial in enumerate(PARTIAL_PROFILES)]
+
+
+def ranked(candidates, skill, limit, min_score):
+    """(total, id) of the top `limit` candidates, computed as the handler does unpruned"""
+    results = [engine.calculate_business_score(USER, business, partial_scores=partial, skill_score=skill(partial))
+               for business, partial in candidates]
+    results = [(r['total_score'], r['business_id']) for r in results if r['total_score'] >= min_score]
+    return sorted(results, key=lambda entry: entry[0], reverse=True)[:max(limit, 0)]
+
+
+def test_weighted_uses_the_weights_in_order():
+    keys = list(engine.WEIGHTS)
+    for key in keys:
+        assert engine._weighted(*(1.0 if k == key else 0.0 for k in keys)) == engine.WEIGHTS[key]
+
+
+@pytest.mark.parametrize('user', USER_VARIANTS + [USER])
+def test_weighted_totals_are_the_dict_sums(user):
+    for b in KERNEL_CATALOGUE:
+        partial = scalar_components(user, b)
+        assert engine.deterministic_floor(partial) == sum(partial[k] * engine.WEIGHTS[k] for k in partial)
+        skill = engine.basic_skill_match(user.get('background', ''), user.get('skills', []), b['title'],
+                                         b['industry'])
+        scores = {k: skill if k == 'skill_match' else partial[k] for k in engine.WEIGHTS}
+        assert engine._weighted(*scores.values()) == sum(scores[k] * engine.WEIGHTS[k] for k in scores)
+
+
+def lifts_the_borderline(limit):
+    """Perfect skill only for candidates just close enough to the limit-th best floor"""
+    floors = sorted((engine.deterministic_floor(p) for _, p in PRUNING_CANDIDATES), reverse=True)
+    bound = floors[min(limit, len(floors)) - 1] - engine.WEIGHTS['skill_match']
+    return lambda partial: 1.0 if bound - 0.001 <= engine.deterministic_floor(partial) < bound + 0.02 else 0.0
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 5, 15, 50])
+@pytest.mark.parametrize('min_score', [0.0, 0.3, 0.55])
+def test_top_k_candidates_keeps_the_unpruned_ranking(limit, min_score):
+    pruned = engine.top_k_candidates(PRUNING_CANDIDATES, limit, min_score)
+    for skill in (lambda p: 0.0, lambda p: 1.0, lambda p: 1.0 - p['startup_cost'], lifts_the_borderline(limit)):
+        assert ranked(pruned, skill, limit, min_score) == ranked(PRUNING_CANDIDATES, skill, limit, min_score)
+    if limit <= 3 and min_score == 0.0:
+        # the point of the pass: low floors never reach skill scoring
+        assert len(pruned) < len(PRUNING_CANDIDATES)
+
+
+@pytest.mark.parametrize('limit', [0, -1, -5])
+def test_top_k_candidates_without_a_limit(limit):
+    assert engine.top_k_candidates(PRUNING_CANDIDATES, limit, 0.0) == []
+
+
+@pytest.mark.parametrize('min_score', [0.3, 0.0])
+def test_handler_returns_no_recommendations_for_limit_zero(sb, min_score):
+    status, body = recommend(use_ai=False, limit=0, min_score=min_score)
+    assert status == 200
+    assert body['recommendations'] == []
+
+
+def test_engine_responses_are_orjson_encoded(sb):
+    payload, status, headers = engine.recommend_businesses(FakeRequest({'user_id': 'u1', 'use_ai': False}))
+    assert status == 200 and headers['Content-Type'] == 'application/json'
+    assert payload.startswith(b'{"success":true,"user_id":"u1","recommendations":[{')
+    for body in (b'{"user_id": ', b'', b'[]'):
+        payload, status, _ = engine.recommend_businesses(FakeRequest(body))
+        assert (status, json.loads(payload)) == (400, {'error': 'user_id required'})
+
+
+@pytest.mark.parametrize('level', ['Beginner', 'Intermediate', 'Advanced', '', 'Expert'])
+def test_time_commitment_takes_the_precomputed_hours(level):
+    business = engine.precompute_business_fields(dict(CATALOGUE[0], skill_level=level))
+    for user_hours in (0, 1, 2, 3, 7):
+        assert (engine.score_time_commitment(user_hours, level, business['_level_hours'])
+                == engine.score_time_commitment(user_hours, level))
+
+
+def test_cache_write_happens_after_the_response(sb, monkeypatch):
+    executor = DeferredExecutor()
+    monkeypatch.setattr(engine, '_CACHE_EXECUTOR', executor)
+    status, body = recommend(use_ai=False)
+    assert status == 200 and sb.upserts == []
+    executor.run()
+    assert [name for name, _ in sb.upserts] == ['recommendations_cache']
+    assert sb.upserts[0][1]['recommendations'] == body['recommendations']
+
+
+def test_cache_write_errors_are_not_raised(sb, monkeypatch, capsys):
+    def broken_table(name):
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(sb, 'table', broken_table)
+    engine._upsert_cached_recommendations({'user_id': 'u1'})
+    assert 'Cache error (non-critical): connection reset' in capsys.readouterr().out
+
+
+def test_cached_business_arrays_score_like_fresh_ones(sb):
+    businesses, arrays = engine.load_published_businesses(None)
+    assert list(arrays['min_cost'][:2]) == [100.0, 50.0]
+    for user in USER_VARIANTS:
+        assert (engine.score_numeric_components(user, businesses, arrays)
+                == [scalar_components(user, b) for b in CATALOGUE])
+
+
+class FakePostgres:
+    """Stand-in for pg_fetch/pg_execute over the same tables as a FakeSupabase"""
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = []
+        self.fail = False
+
+    def fetch(self, query, *args):
+        self.queries.append(query)
+        if self.fail:
+            raise OSError('pooler unreachable')
+        columns, table = query[len('SELECT '):].split(' FROM public.')
+        rows = self.db.tables[table.split()[0]]
+        if args:
+            rows = [r for r in rows if r['id'] == args[0]]
+        elif 'WHERE published = TRUE' in query:
+            rows = [r for r in rows if r.get('published')]
+        return [{c: r[c] for c in columns.split(',') if c in r} for r in rows]
+
+    def execute(self, query, *args):
+        self.queries.append(query)
+        if self.fail:
+            raise OSError('pooler unreachable')
+        keys = ['user_id', 'recommendations', 'total_analyzed', 'user_quiz_hash', 'blueprints_rev']
+        self.db.upserts.append(('recommendations_cache (direct)', dict(zip(keys, args))))
+
+
+@pytest.fixture
+def pg(sb, monkeypatch):
+    fake = FakePostgres(sb)
+    monkeypatch.setattr(engine, 'direct_postgres_enabled', lambda: True)
+    monkeypatch.setattr(engine, 'pg_fetch', fake.fetch)
+    monkeypatch.setattr(engine, 'pg_execute', fake.execute)
+    return fake
+
+
+def test_direct_postgres_reads_and_writes_match_postgrest(pg, sb):
+    pg.fail = True
+    expected = recommend(use_ai=False)
+    sb.upserts.clear()
+    pg.fail = False
+    engine._businesses_cache.update(fetched_at=0.0, rev=None, data=None)
+    sb.selects.clear()
+    pg.queries.clear()
+    assert recommend(use_ai=False) == expected
+    # only the revision lookup is left on PostgREST
+    assert sb.selects == [('blueprints', ['updated_at'])]
+    assert [q.split()[0] for q in pg.queries] == ['SELECT', 'SELECT', 'INSERT']
+    name, row = sb.upserts[0]
+    assert name == 'recommendations_cache (direct)' and len(sb.upserts) == 1
+    assert row['user_id'] == 'u1' and row['recommendations'] == expected[1]['recommendations']
+
+
+def test_failed_direct_queries_fall_back_to_postgrest(pg, sb, capsys):
+    pg.fail = True
+    status, body = recommend(use_ai=False)
+    assert status == 200 and body['total_analyzed'] == len(CATALOGUE)
+    assert [name for name, _ in sb.upserts] == ['recommendations_cache']
+    out = capsys.readouterr().out
+    for step in ('user read', 'blueprints read', 'cache write'):
+        assert f'Direct Postgres {step} failed, using PostgREST' in out
+
+
+def test_missing_range_columns_retry_the_direct_query(pg, monkeypatch):
+    fetch = pg.fetch
+
+    def no_range_columns(query, *args):
+        if engine.BLUEPRINT_RANGE_COLUMNS in query:
+            pg.queries.append(query)
+            raise engine.asyncpg.UndefinedColumnError('column "startup_cost_min" does not exist')
+        return fetch(query, *args)
+
+    monkeypatch.setattr(engine, 'pg_fetch', no_range_columns)
+    businesses, _ = engine.load_published_businesses(None)
+    assert businesses[0]['_cost_range'] == (100, 500)
+    assert len(pg.queries) == 2 and engine.BLUEPRINT_RANGE_COLUMNS not in pg.queries[1]
+
+
+SCORE_USERS = [USER, USER_VARIANTS[1], USER_VARIANTS[2], dict(USER, avoidances=['door'])]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_score_users_ranks_each_user_like_score_businesses(max_workers):
+    expected = [engine.score_businesses(user, [dict(b) for b in KERNEL_CATALOGUE], 0.3, 5) for user in SCORE_USERS]
+    assert engine.score_users(SCORE_USERS, [dict(b) for b in KERNEL_CATALOGUE], 0.3, 5, max_workers) == expected
+    assert engine.score_users([], CATALOGUE) == []
+
+
+def worker_state():
+    """What importing the engine started in a score_users worker"""
+    import scoring_kernel
+    return (engine.get_supabase.cache_info().misses, engine._CACHE_EXECUTOR,
+            len(scoring_kernel.score_all.signatures))
+
+
+def test_spawned_workers_skip_the_cold_start_work(monkeypatch):
+    # with credentials set, the parent process would prewarm Supabase on import
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'k')
+    import concurrent.futures
+    import multiprocessing
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        assert pool.submit(worker_state).result() == (0, None, 0)
+
+
+def test_cache_executor_is_created_on_the_first_write(monkeypatch):
+    monkeypatch.setattr(engine, '_CACHE_EXECUTOR', None)
+    executor = engine._get_cache_executor()
+    assert engine._get_cache_executor() is executor
+    executor.shutdown()